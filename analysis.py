@@ -1,7 +1,15 @@
+import hashlib
+import json
+import os
+import re
+import shutil
 from collections import defaultdict
+from pathlib import Path
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+
+from readme_store import ReadmeStore
+from result_sink import ResultSink
 
 TOPIC_KEYWORDS = {
     # =======================
@@ -290,9 +298,180 @@ TOPIC_KEYWORDS = {
 
 
 _TOPIC_NAMES = list(TOPIC_KEYWORDS.keys())
-_TOPIC_DOCS = [" ".join(TOPIC_KEYWORDS[t]) for t in _TOPIC_NAMES]
-_VECTORIZER = TfidfVectorizer(stop_words="english", ngram_range=(1, 3))
-_TOPIC_VECS = _VECTORIZER.fit_transform(_TOPIC_DOCS)  # [n_topics, n_words]
+
+TAG_BATCH_SIZE = 256
+# 预编译的话题模型：词表、IDF 与话题矩阵，按关键词与向量器参数的指纹分目录存放
+TOPIC_MODEL_DIR = Path("cache") / "topic_model"
+TOPIC_MODEL_VERSION = 1
+_VECTORIZER_PARAMS = {"stop_words": "english", "ngram_range": [1, 3]}
+# 与 sklearn TfidfVectorizer 默认的 token_pattern 一致
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+_TOPIC_MODEL = None
+
+
+def keywords_hash(keywords: dict[str, list[str]] | None = None) -> str:
+    # 话题关键词的指纹，关键词调整后据此判断历史结果是否需要重新计算
+    raw = json.dumps(keywords or TOPIC_KEYWORDS, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _topic_model_hash() -> str:
+    raw = json.dumps(
+        {
+            "version": TOPIC_MODEL_VERSION,
+            "keywords": keywords_hash(),
+            "vectorizer": _VECTORIZER_PARAMS,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def build_topic_model(root: Path | None = None, *, force: bool = False) -> Path:
+    """
+    用 sklearn 在 TOPIC_KEYWORDS 上拟合 TF-IDF，把结果编译为模型目录：
+    - meta.json: 话题顺序、词表、停用词与 n-gram 范围
+    - idf.npy / topic_matrix.npy: 运行时以内存映射方式读取
+    关键词不变时直接复用已有的目录
+    """
+    root = Path(root or TOPIC_MODEL_DIR)
+    path = root / _topic_model_hash()
+    if path.exists() and not force:
+        return path
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(
+        stop_words=_VECTORIZER_PARAMS["stop_words"],
+        ngram_range=tuple(_VECTORIZER_PARAMS["ngram_range"]),
+    )
+    topic_docs = [" ".join(TOPIC_KEYWORDS[topic]) for topic in _TOPIC_NAMES]
+    topic_vecs = vectorizer.fit_transform(topic_docs)  # [n_topics, n_words]
+
+    tmp_path = root / f".{path.name}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    (tmp_path / "meta.json").write_text(
+        json.dumps(
+            {
+                "version": TOPIC_MODEL_VERSION,
+                "keywords_hash": keywords_hash(),
+                "topics": _TOPIC_NAMES,
+                "ngram_range": _VECTORIZER_PARAMS["ngram_range"],
+                "stop_words": sorted(vectorizer.get_stop_words()),
+                "vocabulary": {
+                    term: int(index) for term, index in vectorizer.vocabulary_.items()
+                },
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    np.save(tmp_path / "idf.npy", vectorizer.idf_)
+    # 按词存储话题权重 [n_words, n_topics]，打分时按词行读取
+    np.save(tmp_path / "topic_matrix.npy", np.ascontiguousarray(topic_vecs.T.toarray()))
+
+    if force:
+        shutil.rmtree(path, ignore_errors=True)
+    try:
+        tmp_path.rename(path)
+    except OSError:
+        # 其它进程已经编译好同一版本
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+class TopicModel:
+    """
+    只依赖 numpy 的 TF-IDF 打分，结果与 sklearn 的 transform + 余弦相似度一致，
+    运行时不需要导入 sklearn，IDF 与话题矩阵以只读内存映射方式共享
+    """
+
+    def __init__(self, path: Path):
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.path = path
+        self.topic_names = meta["topics"]
+        self.vocabulary = meta["vocabulary"]
+        self.stop_words = frozenset(meta["stop_words"])
+        self.min_n, self.max_n = meta["ngram_range"]
+        self.idf = np.load(path / "idf.npy", mmap_mode="r")
+        self.topic_matrix = np.load(path / "topic_matrix.npy", mmap_mode="r")
+
+    def _term_counts(self, text: str) -> dict[int, int]:
+        tokens = [
+            token
+            for token in _TOKEN_PATTERN.findall(text.lower())
+            if token not in self.stop_words
+        ]
+        counts = {}
+        for n in range(self.min_n, min(self.max_n, len(tokens)) + 1):
+            for start in range(len(tokens) - n + 1):
+                index = self.vocabulary.get(" ".join(tokens[start : start + n]))
+                if index is not None:
+                    counts[index] = counts.get(index, 0) + 1
+        return counts
+
+    def score(self, texts: list[str]) -> np.ndarray:
+        """
+        output: [n_texts, n_topics]
+        """
+        indptr = [0]
+        indices = []
+        counts = []
+        for text in texts:
+            term_counts = self._term_counts(text)
+            indices.extend(term_counts)
+            counts.extend(term_counts.values())
+            indptr.append(len(indices))
+
+        indptr = np.asarray(indptr)
+        indices = np.asarray(indices, dtype=np.intp)
+        weights = np.asarray(counts, dtype=np.float64) * self.idf[indices]
+
+        # 每个文本的 TF-IDF 行向量做 L2 归一化，再与话题矩阵相乘
+        row_lengths = np.diff(indptr)
+        rows = np.repeat(np.arange(len(texts)), row_lengths)
+        norms = np.sqrt(np.bincount(rows, weights=weights**2, minlength=len(texts)))
+        weights /= norms[rows]
+
+        scores = np.zeros((len(texts), len(self.topic_names)))
+        nonempty = np.flatnonzero(row_lengths)
+        if len(nonempty):
+            scores[nonempty] = np.add.reduceat(
+                weights[:, None] * self.topic_matrix[indices],
+                indptr[:-1][nonempty],
+                axis=0,
+            )
+        return scores
+
+
+def load_topic_model() -> TopicModel:
+    """
+    首次分类时加载模型，关键词变化后自动重新编译
+    """
+    global _TOPIC_MODEL
+    if _TOPIC_MODEL is None or _TOPIC_MODEL.path.name != _topic_model_hash():
+        _TOPIC_MODEL = TopicModel(build_topic_model())
+    return _TOPIC_MODEL
+
+
+def classify_repos(texts: list[str]) -> tuple[list[str], np.ndarray]:
+    """
+    批量分类：所有文本的 TF-IDF 行一次性与话题矩阵相乘
+    TF-IDF 行向量已经 L2 归一化，点积即余弦相似度
+    output: best_topics, scores [n_texts, n_topics]
+    """
+    if not texts:
+        return [], np.zeros((0, len(_TOPIC_NAMES)))
+
+    scores = load_topic_model().score(texts)  # [n_texts, n_topics]
+
+    best_indexes = scores.argmax(axis=1)
+    best_topics = [
+        _TOPIC_NAMES[index] if scores[row, index] >= 0.1 else "Unknown"
+        for row, index in enumerate(best_indexes)
+    ]
+    return best_topics, scores
 
 
 def classify_repo(text: str):
@@ -300,18 +479,11 @@ def classify_repo(text: str):
     input: repo_name + repo_description
     output: best_topic, (topic: score)
     """
-    repo_vec = _VECTORIZER.transform([text])  # [1, n_words]
-    sims = cosine_similarity(repo_vec, _TOPIC_VECS)[0]  # [n_topics]
-
-    topic_scores = {topic: float(score) for topic, score in zip(_TOPIC_NAMES, sims)}
-    best_topic = max(topic_scores, key=topic_scores.get)
-
-    if topic_scores[best_topic] < 0.1:
-        best_topic = "Unknown"
-    return best_topic, topic_scores
+    best_topics, scores = classify_repos([text])
+    return best_topics[0], dict(zip(_TOPIC_NAMES, scores[0].tolist()))
 
 
-def tag_repo(repo: dict):
+def _repo_text(repo: dict, readme_store: ReadmeStore | None = None) -> str:
     # 基础文本 （名称 + 描述）
     base_text = f"{repo.get('repo_name', '')} {repo.get('repo_describe', '')}"
 
@@ -321,18 +493,102 @@ def tag_repo(repo: dict):
         text = base_text + " " + " ".join(repo_topics)
     else:
         text = base_text
-    # README.md
-    repo_readme = repo.get("repo_readme", "")
+    # README.md，正文不在内存中时按 blob oid 从 README 存储读取
+    repo_readme = repo.get("repo_readme")
+    if repo_readme is None and repo.get("repo_readme_oid"):
+        repo_readme = (readme_store or ReadmeStore()).get(repo["repo_readme_oid"])
     if repo_readme:
         text += " " + repo_readme
+    return text
 
-    topic, topic_scores = classify_repo(text)
+
+def tag_repo(repo: dict, readme_store: ReadmeStore | None = None):
+    topic, topic_scores = classify_repo(_repo_text(repo, readme_store))
 
     repo["topic"] = topic
     repo["topic_scores"] = topic_scores
     return repo
 
 
+def tag_repos(
+    repos: list[dict],
+    readme_store: ReadmeStore | None = None,
+    *,
+    batch_size: int = TAG_BATCH_SIZE,
+) -> list[dict]:
+    """
+    批量版 tag_repo，按 batch_size 分批，同一时间只有一批 README 在内存中
+    """
+    readme_store = readme_store or ReadmeStore()
+    for start in range(0, len(repos), batch_size):
+        batch = repos[start : start + batch_size]
+        best_topics, scores = classify_repos(
+            [_repo_text(repo, readme_store) for repo in batch]
+        )
+        for repo, topic, row in zip(batch, best_topics, scores.tolist()):
+            repo["topic"] = topic
+            repo["topic_scores"] = dict(zip(_TOPIC_NAMES, row))
+    return repos
+
+
+class TaggingSink(ResultSink):
+    """
+    边抓取边打标签：每攒满 batch_size 个 repo 批量 tag_repos，README 只在打分期间读入内存，
+    打完标签的记录按到达顺序交给 inner 输出
+    tag_cache: 多个时间范围共享时，同一 repo 只分类一次
+    """
+
+    def __init__(
+        self,
+        inner: ResultSink | None = None,
+        *,
+        readme_store: ReadmeStore | None = None,
+        tag_cache: dict | None = None,
+        batch_size: int = 32,
+    ):
+        self.inner = inner
+        self.readme_store = readme_store or ReadmeStore()
+        self.tag_cache = tag_cache if tag_cache is not None else {}
+        self.batch_size = batch_size
+        self.repos = []
+        self._pending = []
+
+    def write(self, record: dict):
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        untagged = {}
+        for record in pending:
+            key = (record.get("repo_author"), record.get("repo_name"))
+            if key not in self.tag_cache and key not in untagged:
+                untagged[key] = record
+        tag_repos(list(untagged.values()), self.readme_store)
+        for key, record in untagged.items():
+            self.tag_cache[key] = (record["topic"], record["topic_scores"])
+
+        for record in pending:
+            key = (record.get("repo_author"), record.get("repo_name"))
+            record.pop("repo_readme", None)
+            record["topic"], record["topic_scores"] = self.tag_cache[key]
+            self.repos.append(record)
+            if self.inner is not None:
+                self.inner.write(record)
+
+    def close(self):
+        self.flush()
+        if self.inner is not None:
+            self.inner.close()
+
+    def abort(self):
+        # 已到达的记录仍然写出，保留在 inner 的部分结果中
+        self.flush()
+        if self.inner is not None:
+            self.inner.abort()
+
+
 # 按 topic 分数聚合 repo
 def aggregate_by_topic_score(
     repos, *, min_score: float = 0.12, relative_ratio: float = 0.55
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+
+from aiohttp import web
+
+import history_store
+from history_store import (
+    TIME_RANGES,
+    load_all_topic_histories,
+    load_latest_topic_snapshot,
+    load_repo_star_series,
+    load_topic_history,
+)
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# 缓存键包含客户端传入的话题、语言与 limit，按最近使用淘汰，避免内存随查询参数增长
+CACHE_MAX_ENTRIES = 512
+
+
+def _data_version() -> tuple[int, ...]:
+    # 新快照以重命名方式落盘会更新目录 mtime；SQLite 写入会更新主库或 WAL 文件
+    repo_db = history_store.REPO_DB_PATH
+    versions = []
+    for path in (
+        history_store.SNAPSHOT_DIR,
+        repo_db,
+        repo_db.with_name(repo_db.name + "-wal"),
+    ):
+        try:
+            versions.append(path.stat().st_mtime_ns)
+        except OSError:
+            versions.append(0)
+    return tuple(versions)
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+class TopicQueryAPI:
+    """
+    话题热度 / 历史的 JSON 查询接口：
+    - 响应正文缓存在内存中，快照目录或仓库数据库变化时整体失效，最多保留 cache_max_entries 条
+    - 每个响应带 ETag，客户端带 If-None-Match 轮询时未变化直接返回 304
+    """
+
+    def __init__(
+        self,
+        *,
+        languages: list[str],
+        time_range: str = "daily",
+        cache_max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        self.default_languages = languages
+        self.default_time_range = time_range
+        self.cache_max_entries = cache_max_entries
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "evicted": 0}
+        self._cache = OrderedDict()
+        self._version = None
+
+    def _params(self, request: web.Request) -> tuple[str, list[str], int]:
+        time_range = request.query.get("time_range", self.default_time_range)
+        if time_range not in TIME_RANGES:
+            raise web.HTTPBadRequest(
+                text=json.dumps({"error": f"unknown time_range: {time_range}"}),
+                content_type="application/json",
+            )
+
+        raw_languages = request.query.get("languages")
+        languages = (
+            [language for language in raw_languages.split(",") if language]
+            if raw_languages is not None
+            else self.default_languages
+        )
+
+        try:
+            limit = max(1, int(request.query.get("limit", 20)))
+        except ValueError:
+            raise web.HTTPBadRequest(
+                text=json.dumps({"error": "limit must be an integer"}),
+                content_type="application/json",
+            )
+        return time_range, languages, limit
+
+    async def _respond(self, request: web.Request, key: tuple, loader) -> web.Response:
+        version = _data_version()
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+
+        entry = self._cache.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            loop = asyncio.get_running_loop()
+            status, data = await loop.run_in_executor(None, loader)
+            body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            )
+            etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+            entry = self._cache[key] = (status, etag, body)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+                self.stats["evicted"] += 1
+        else:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+
+        status, etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if status == 200 and _etag_matches(request.headers.get("If-None-Match"), etag):
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(
+            status=status, body=body, content_type="application/json", headers=headers
+        )
+
+    async def latest_topics(self, request: web.Request) -> web.Response:
+        time_range, languages, _ = self._params(request)
+
+        def load():
+            snapshot = load_latest_topic_snapshot(
+                time_range=time_range, languages=languages
+            )
+            if snapshot is None:
+                return 404, {"error": "no snapshot"}
+            return 200, snapshot
+
+        key = ("latest", time_range, tuple(languages))
+        return await self._respond(request, key, load)
+
+    async def topic_history(self, request: web.Request) -> web.Response:
+        time_range, languages, limit = self._params(request)
+        topic_name = request.match_info["topic"]
+
+        def load():
+            topic, history = load_topic_history(
+                topic_name, time_range=time_range, languages=languages, limit=limit
+            )
+            if topic is None:
+                return 404, {"error": f"unknown topic: {topic_name}"}
+            return 200, {"topic": topic, "history": history}
+
+        key = ("history", topic_name.lower(), time_range, tuple(languages), limit)
+        return await self._respond(request, key, load)
+
+    async def topic_trends(self, request: web.Request) -> web.Response:
+        time_range, languages, limit = self._params(request)
+
+        def load():
+            return 200, load_all_topic_histories(
+                time_range=time_range, languages=languages, limit=limit
+            )
+
+        key = ("trends", time_range, tuple(languages), limit)
+        return await self._respond(request, key, load)
+
+    async def repo_stars(self, request: web.Request) -> web.Response:
+        _, _, limit = self._params(request)
+        repo = f"{request.match_info['owner']}/{request.match_info['name']}"
+        time_range = request.query.get("time_range")
+
+        def load():
+            return 200, {
+                "repo": repo.lower(),
+                "series": load_repo_star_series(
+                    repo, time_range=time_range, limit=limit
+                ),
+            }
+
+        key = ("stars", repo.lower(), time_range, limit)
+        return await self._respond(request, key, load)
+
+    async def cache_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "entries": len(self._cache)})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/topics", self.latest_topics)
+        app.router.add_get("/api/topics/{topic}/history", self.topic_history)
+        app.router.add_get("/api/trends", self.topic_trends)
+        app.router.add_get("/api/repos/{owner}/{name}/stars", self.repo_stars)
+        app.router.add_get("/api/cache", self.cache_stats)
+        return app
+
+
+def run_api_server(
+    *,
+    languages: list[str],
+    time_range: str = "daily",
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+):
+    api = TopicQueryAPI(languages=languages, time_range=time_range)
+    web.run_app(api.make_app(), host=host, port=port)
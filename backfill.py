@@ -0,0 +1,120 @@
+import concurrent.futures
+import os
+from datetime import datetime
+from pathlib import Path
+
+from analysis import (
+    aggregate_by_topic_score,
+    build_topic_model,
+    keywords_hash,
+    load_topic_model,
+    tag_repos,
+)
+from history_store import (
+    list_repo_runs,
+    load_backfilled_runs,
+    load_run_repo_infos,
+    mark_runs_backfilled,
+    normalize_languages,
+    save_topic_snapshot,
+)
+from readme_store import ReadmeStore
+from topic import compute_topic_heat
+
+
+BACKFILL_CHUNK_RUNS = 4
+
+# 每个 worker 进程只初始化一次：话题模型以内存映射方式加载，README 存储复用
+_README_STORE = None
+
+
+def _init_worker():
+    global _README_STORE
+    _README_STORE = ReadmeStore()
+    load_topic_model()
+
+
+def _retag_runs(runs: list[dict], db_path: Path | None) -> list[tuple[dict, dict]]:
+    """
+    worker 进程：重新打标签并计算每次运行的话题热度
+    return: [(run, topic_heat), ...]
+    """
+    results = []
+    for run in runs:
+        repo_infos = tag_repos(load_run_repo_infos(run["id"], db_path), _README_STORE)
+        topic_heat = compute_topic_heat(aggregate_by_topic_score(repo_infos))
+        results.append((run, topic_heat))
+    return results
+
+
+def _write_snapshot(run: dict, topic_heat: dict):
+    save_topic_snapshot(
+        topic_heat,
+        time_range=run["time_range"],
+        languages=run["languages"],
+        created_at=datetime.fromisoformat(run["created_at"]),
+    )
+
+
+def backfill_topic_history(
+    *,
+    workers: int | None = None,
+    languages: list[str] | None = None,
+    db_path: Path | None = None,
+    chunk_runs: int = BACKFILL_CHUNK_RUNS,
+    log=print,
+) -> dict:
+    """
+    用当前的 TOPIC_KEYWORDS 重新分类所有已存储的 repo 记录，并重新生成每次运行的话题快照
+    - 按运行拆分到进程池，各 worker 以内存映射方式共享预编译的话题模型
+    - 已完成的运行按关键词指纹记录在数据库中，中断后重新执行会从未完成的运行继续
+    - 添加 description / readme_oid 列之前存储的运行没有描述和 README，无法按原文重新分类，
+      保留其原有快照，计入 legacy 不回填
+    languages: 只回填该语言组合的运行，None 表示全部
+    """
+    fingerprint = keywords_hash()
+    done = load_backfilled_runs(fingerprint, db_path)
+    runs = list_repo_runs(db_path)
+    if languages is not None:
+        runs = [
+            run for run in runs if run["languages"] == normalize_languages(languages)
+        ]
+    legacy = [run for run in runs if run["legacy"]]
+    pending = [run for run in runs if run["id"] not in done and not run["legacy"]]
+    stats = {
+        "keywords_hash": fingerprint,
+        "runs": len(runs),
+        "skipped": len(runs) - len(pending) - len(legacy),
+        "legacy": len(legacy),
+        "regenerated": 0,
+    }
+    if legacy:
+        log(f"{len(legacy)} runs predate stored descriptions / READMEs, kept as is")
+    if not pending:
+        return stats
+
+    # 主进程先编译好话题模型，worker 只需内存映射加载
+    build_topic_model()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    chunks = [
+        pending[start : start + chunk_runs]
+        for start in range(0, len(pending), chunk_runs)
+    ]
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    )
+    try:
+        futures = [pool.submit(_retag_runs, chunk, db_path) for chunk in chunks]
+        for future in concurrent.futures.as_completed(futures):
+            finished = []
+            for run, topic_heat in future.result():
+                _write_snapshot(run, topic_heat)
+                finished.append(run["id"])
+            # 快照写完后再记录进度，中断后只重算尚未记录的批次
+            mark_runs_backfilled(fingerprint, finished, db_path)
+            stats["regenerated"] += len(finished)
+            log(f"backfilled {stats['regenerated']}/{len(pending)} runs")
+    finally:
+        # 中断时取消尚未开始的批次
+        pool.shutdown(cancel_futures=True)
+    return stats
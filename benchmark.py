@@ -0,0 +1,640 @@
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+import crawler
+from throttle import HostRateLimiter
+
+
+def _synthetic_detail_page(index: int, readme_paragraphs: int = 1500) -> str:
+    repo_path = f"/owner{index}/repo{index}"
+    readme = "".join(
+        f"<p>Paragraph {n} about llm inference serving and <code>kv cache</code>.</p>"
+        for n in range(readme_paragraphs)
+    )
+    return f"""<html><body>
+<nav aria-label="Repository">
+  <a href="{repo_path}/issues"><span>Issues</span><span title="1,024">1k</span></a>
+  <a href="{repo_path}/pulls"><span>Pull requests</span><span>87</span></a>
+</nav>
+<div class="hide-sm hide-md"><div class="my-3"><a> llm </a><a> agent </a></div></div>
+<table aria-labelledby="folders-and-files"><tbody><tr><td>
+  <span class="fgColor-default">12,345 Commits</span>
+</td></tr></tbody></table>
+<article class="markdown-body">{readme}</article>
+</body></html>"""
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[int((len(values) - 1) * q)]
+
+
+async def _heartbeat(stalls: list[float], done: asyncio.Event, interval: float):
+    # 1ms 心跳，实际间隔超出的部分即事件循环卡顿
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - started - interval)
+
+
+async def _measure_loop_stall(pages: list[str], executor: str) -> dict:
+    crawler.PARSE_EXECUTOR = executor
+    interval = 0.001
+    stalls = []
+    done = asyncio.Event()
+
+    heartbeat_task = asyncio.create_task(_heartbeat(stalls, done, interval))
+    await asyncio.sleep(interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            crawler._run_parser(
+                crawler.parse_repo_detail, html, f"/owner{index}/repo{index}"
+            )
+            for index, html in enumerate(pages)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    done.set()
+    await heartbeat_task
+
+    return {
+        "executor": executor,
+        "pages": len(pages),
+        "elapsed_s": round(elapsed, 4),
+        "max_stall_ms": round(max(stalls, default=0.0) * 1000, 3),
+        "p99_stall_ms": round(_percentile(stalls, 0.99) * 1000, 3),
+        "total_stall_ms": round(sum(stalls) * 1000, 3),
+    }
+
+
+def bench_parse(args) -> list[dict]:
+    """
+    对比在事件循环内解析（inline，旧行为）与放到线程 / 进程池解析时的事件循环卡顿
+    """
+    pages = [_synthetic_detail_page(index) for index in range(args.pages)]
+    results = []
+    for executor in ("inline", "thread", "process"):
+        results.append(asyncio.run(_measure_loop_stall(pages, executor)))
+        if crawler._PARSE_POOL is not None:
+            crawler._PARSE_POOL.shutdown()
+            crawler._PARSE_POOL = None
+    return results
+
+
+def _synthetic_repo_texts(count: int, seed: int = 0) -> list[str]:
+    # 从话题关键词中随机抽词拼出仓库名、描述、标签与 README
+    import analysis
+
+    rng = random.Random(seed)
+    keywords = [word for words in analysis.TOPIC_KEYWORDS.values() for word in words]
+    filler = "install usage license contributing example config build docs".split()
+    texts = []
+    for index in range(count):
+        words = rng.sample(keywords, 6) + rng.choices(filler, k=40)
+        rng.shuffle(words)
+        texts.append(f"repo{index} " + " ".join(words))
+    return texts
+
+
+def bench_classify(args) -> list[dict]:
+    """
+    对比逐个 transform + cosine_similarity（旧行为）与 classify_repos 一次批量打分
+    classify_repos 使用预编译的话题模型，参照组在同样的关键词上重新拟合 sklearn 向量器
+    """
+    # 只在本子命令中加载 sklearn，吞吐基准的子进程不需要它
+    import analysis
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    vectorizer = TfidfVectorizer(stop_words="english", ngram_range=(1, 3))
+    topic_vecs = vectorizer.fit_transform(
+        [" ".join(words) for words in analysis.TOPIC_KEYWORDS.values()]
+    )
+    analysis.load_topic_model()
+
+    results = []
+    for size in args.sizes:
+        texts = _synthetic_repo_texts(size, args.seed)
+
+        started = time.perf_counter()
+        per_repo = [
+            cosine_similarity(vectorizer.transform([text]), topic_vecs)[0]
+            for text in texts
+        ]
+        per_repo_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, scores = analysis.classify_repos(texts)
+        batched_s = time.perf_counter() - started
+
+        results.append(
+            {
+                "repos": size,
+                "per_repo_s": round(per_repo_s, 4),
+                "batched_s": round(batched_s, 4),
+                "speedup": round(per_repo_s / max(batched_s, 1e-9), 1),
+                "max_abs_diff": float(abs(scores - per_repo).max()),
+            }
+        )
+    return results
+
+
+# main.py 各模式的导入耗时预算（毫秒）以及不允许导入的模块
+IMPORT_BUDGETS = {
+    "help": {
+        "argv": ["--help"],
+        "budget_ms": 100,
+        "forbidden": ["rich", "numpy", "sklearn", "aiohttp", "lxml"],
+    },
+    "trending-local": {
+        "argv": ["--trending", "local"],
+        "budget_ms": 250,
+        "forbidden": ["numpy", "sklearn", "aiohttp", "lxml", "analysis", "crawler"],
+    },
+}
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def _measure_imports(argv: list[str], cwd: str) -> tuple[float, set[str]]:
+    """
+    用 -X importtime 运行 main.py，只统计解释器启动（site）之后的顶层导入
+    return: 导入耗时（毫秒）, 导入过的顶层包
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(Path(__file__).with_name("main.py"))]
+        + argv,
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    total_us = 0
+    packages = set()
+    started = False
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if not started:
+            started = not indent and name == "site"
+            continue
+        packages.add(name.split(".", 1)[0])
+        if not indent:
+            total_us += int(cumulative)
+    return total_us / 1000, packages
+
+
+def bench_imports(args) -> list[dict]:
+    """
+    检查各 CLI 模式的导入耗时与导入的模块，超出预算时以非零状态退出
+    在空的临时目录中运行，不读取已有的历史数据
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for mode in args.modes:
+            spec = IMPORT_BUDGETS[mode]
+            samples = [_measure_imports(spec["argv"], cwd) for _ in range(args.repeat)]
+            import_ms = min(sample[0] for sample in samples)
+            forbidden = sorted(set(spec["forbidden"]) & samples[0][1])
+            budget_ms = spec["budget_ms"] * args.budget_scale
+            results.append(
+                {
+                    "mode": mode,
+                    "import_ms": round(import_ms, 1),
+                    "budget_ms": budget_ms,
+                    "forbidden_imports": forbidden,
+                    "ok": import_ms <= budget_ms and not forbidden,
+                }
+            )
+    return results
+
+
+class StandInGitHub:
+    """
+    模拟 GitHub 的本地 aiohttp 服务：/trending/{lang}、仓库详情页与 /graphql，
+    延迟分布、错误率和页面大小均可配置，并记录服务端每个请求的耗时
+    """
+
+    def __init__(
+        self,
+        *,
+        repos_per_page: int = 25,
+        latency_ms: float = 50.0,
+        latency_dist: str = "lognormal",
+        graphql_per_repo_ms: float = 20.0,
+        error_rate: float = 0.0,
+        page_kb: int = 300,
+        readme_kb: int = 8,
+        seed: int = 0,
+    ):
+        self.repos_per_page = repos_per_page
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.graphql_per_repo_ms = graphql_per_repo_ms
+        self.error_rate = error_rate
+        self.page_padding = "<p>padding</p>" * (page_kb * 1024 // 14)
+        self.readme = "llm inference serving agent " * (readme_kb * 1024 // 28)
+        self.random = random.Random(seed)
+        self.latencies = {"list": [], "detail": [], "graphql": []}
+        self.errors = 0
+        self._runner = None
+
+    def _delay(self, extra_ms: float = 0.0) -> float:
+        if self.latency_dist == "fixed":
+            delay = self.latency_ms
+        elif self.latency_dist == "uniform":
+            delay = self.random.uniform(0, 2 * self.latency_ms)
+        else:
+            # 中位数为 latency_ms 的长尾分布
+            delay = self.latency_ms * self.random.lognormvariate(0, 0.5)
+        return (delay + extra_ms) / 1000
+
+    def reset(self):
+        for samples in self.latencies.values():
+            samples.clear()
+        self.errors = 0
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        kind = (
+            "graphql"
+            if request.path == "/graphql"
+            else "list" if request.path.startswith("/trending") else "detail"
+        )
+        started = time.perf_counter()
+        response = await handler(request)
+        self.latencies[kind].append(time.perf_counter() - started)
+        return response
+
+    def _fail(self) -> bool:
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    async def _trending(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self._delay())
+        if self._fail():
+            return web.Response(status=502)
+
+        language = request.match_info.get("language", "all")
+        articles = "".join(
+            f"""<article><h2><a href="/{language}-owner{n}/repo{n}">
+<span>{language}-owner{n} /</span> repo{n}</a></h2><p>repo {n} for llm agents</p>
+<div><span itemprop="programmingLanguage">{language}</span></div>
+<div><a>1,{n:03d}</a><a>{n}</a>
+<span class="d-inline-block float-sm-right">{n + 1} stars today</span></div>
+</article>"""
+            for n in range(self.repos_per_page)
+        )
+        return web.Response(
+            text=f'<html><body><div class="Box"><div></div><div>{articles}'
+            "</div></div></body></html>",
+            content_type="text/html",
+        )
+
+    async def _repo(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self._delay())
+        if self._fail():
+            return web.Response(status=502)
+
+        repo_path = request.path
+        return web.Response(
+            text=f"""<html><body>
+<nav aria-label="Repository">
+  <a href="{repo_path}/issues"><span>Issues</span><span>12</span></a>
+  <a href="{repo_path}/pulls"><span>Pull requests</span><span>3</span></a>
+</nav>
+<div class="hide-sm hide-md"><div class="my-3"><a> llm </a><a> agent </a></div></div>
+<table aria-labelledby="folders-and-files"><tbody><tr><td>
+  <span class="fgColor-default">1,234 Commits</span>
+</td></tr></tbody></table>
+<article class="markdown-body">{self.readme}</article>
+{self.page_padding}</body></html>""",
+            content_type="text/html",
+        )
+
+    async def _graphql(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        query = payload["query"]
+        variables = payload.get("variables") or {}
+        batch_size = sum(1 for key in variables if key.startswith("owner"))
+        await asyncio.sleep(self._delay(self.graphql_per_repo_ms * batch_size))
+        if self._fail():
+            return web.Response(status=502)
+
+        readme_aliases = re.findall(r"(readme_\w+): object", query)
+        data = {}
+        for index in range(batch_size):
+            node = {}
+            if "stargazerCount" in query:
+                node.update(
+                    {
+                        "description": "repo for llm agents",
+                        "primaryLanguage": {"name": "Python"},
+                        "stargazerCount": 1000 + index,
+                        "forkCount": index,
+                        "openIssues": {"totalCount": 12},
+                        "openPullRequests": {"totalCount": 3},
+                        "defaultBranchRef": {
+                            "target": {"oid": "0" * 40, "history": {"totalCount": 1234}}
+                        },
+                        "repositoryTopics": {"nodes": [{"topic": {"name": "llm"}}]},
+                    }
+                )
+            for alias in readme_aliases:
+                node[alias] = {"isBinary": False, "text": self.readme}
+            data[f"repo_{index}"] = node
+        data["rateLimit"] = {
+            "limit": 5000,
+            "cost": 1,
+            "remaining": 4999,
+            "resetAt": "2099-01-01T00:00:00Z",
+        }
+        return web.json_response({"data": data})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/graphql", self._graphql)
+        app.router.add_get("/trending", self._trending)
+        app.router.add_get("/trending/{language}", self._trending)
+        app.router.add_get("/{owner}/{name}", self._repo)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+async def _timed_crawl(languages: list[str]) -> dict:
+    stalls = []
+    done = asyncio.Event()
+    heartbeat_task = asyncio.create_task(_heartbeat(stalls, done, 0.001))
+
+    started = time.perf_counter()
+    range_repo_infos = await crawler._crawl_trending_async(languages, ["daily"])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await heartbeat_task
+
+    repos = crawler.RUN_SUMMARY.get("repos", 0)
+    graphql = crawler.RUN_SUMMARY.get("graphql") or {}
+    return {
+        "repos": repos,
+        "list_repos": len(range_repo_infos["daily"]),
+        "elapsed_s": round(elapsed, 4),
+        "repos_per_s": round(repos / elapsed, 2) if elapsed else 0.0,
+        "loop_lag_max_ms": round(max(stalls, default=0.0) * 1000, 3),
+        "loop_lag_p99_ms": round(_percentile(stalls, 0.99) * 1000, 3),
+        "graphql_final": {
+            "batch_sizes": graphql.get("batch_sizes", {}),
+            "concurrency": graphql.get("concurrency"),
+            "html_fallback": graphql.get("html_fallback", 0),
+        },
+    }
+
+
+def _latency_stats(samples: dict[str, list[float]]) -> dict:
+    return {
+        kind: {
+            "requests": len(values),
+            "p50": round(_percentile(values, 0.5) * 1000, 2),
+            "p99": round(_percentile(values, 0.99) * 1000, 2),
+        }
+        for kind, values in samples.items()
+        if values
+    }
+
+
+def _timed(func, samples: dict[str, list[float]], kind_of):
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            samples[kind_of(*args)].append(time.perf_counter() - started)
+
+    return wrapper
+
+
+def _crawl_once(base_url: str, settings: dict, languages: list[str]) -> dict:
+    # 在独立子进程中运行，保证每组参数的峰值 RSS 互不影响
+    crawler.GITHUB_URL = base_url
+    crawler.GITHUB_GRAPHQL_URL = f"{base_url}/graphql"
+    crawler.PROXY_URL = None
+    crawler.HTTP_CACHE_ENABLED = False
+    crawler.REPO_CACHE_ENABLED = False
+    crawler.ARCHIVE_MODE = None
+    crawler.GITHUB_TOKENS = [f"bench-token-{n}" for n in range(settings["tokens"])]
+    crawler.LIST_PAGE_CONCURRENCY = settings["list_concurrency"]
+    crawler.DETAIL_PAGE_CONCURRENCY = settings["detail_concurrency"]
+    crawler.GRAPHQL_BATCH_SIZE = settings["graphql_batch_size"]
+    crawler.GRAPHQL_CONCURRENCY = settings["graphql_concurrency"]
+    # 本地服务没有 GitHub 的限流，不让令牌桶影响并发参数的对比
+    crawler.RATE_LIMITER = HostRateLimiter({}, default=(1e9, 10**9))
+    # 在爬虫一侧计时：包含并发限制、限速器、连接池排队、重试与读取正文的时间
+    # GraphQL 批次的耗时包含其中的 README 兜底查询
+    samples = {"list": [], "detail": [], "graphql": []}
+    crawler._fetch_text = _timed(
+        crawler._fetch_text,
+        samples,
+        lambda session, url, *args: "list" if "/trending" in url else "detail",
+    )
+    crawler._fetch_graphql_batch = _timed(
+        crawler._fetch_graphql_batch, samples, lambda *args: "graphql"
+    )
+
+    # README 等相对路径的缓存写到临时目录，不污染当前目录下的 cache/readmes
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            result = asyncio.run(_timed_crawl(languages))
+        finally:
+            os.chdir(cwd)
+    result["latency_ms"] = _latency_stats(samples)
+    result["peak_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    return result
+
+
+async def _run_throughput_grid(args) -> list[dict]:
+    server = StandInGitHub(
+        repos_per_page=args.repos_per_page,
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        graphql_per_repo_ms=args.graphql_per_repo_ms,
+        error_rate=args.error_rate,
+        page_kb=args.page_kb,
+        readme_kb=args.readme_kb,
+        seed=args.seed,
+    )
+    base_url = await server.start()
+    languages = [f"lang{n}" for n in range(args.list_pages)]
+    loop = asyncio.get_running_loop()
+    context = multiprocessing.get_context("spawn")
+
+    results = []
+    try:
+        for values in itertools.product(
+            args.list_concurrency,
+            args.detail_concurrency,
+            args.graphql_batch_size,
+            args.graphql_concurrency,
+        ):
+            settings = dict(
+                zip(
+                    (
+                        "list_concurrency",
+                        "detail_concurrency",
+                        "graphql_batch_size",
+                        "graphql_concurrency",
+                    ),
+                    values,
+                ),
+                tokens=args.tokens,
+            )
+            server.reset()
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=context
+            ) as pool:
+                result = await loop.run_in_executor(
+                    pool, _crawl_once, base_url, settings, languages
+                )
+
+            result["settings"] = settings
+            # 服务端处理耗时基本等于配置的延迟分布，仅作为对照
+            result["server_latency_ms"] = _latency_stats(server.latencies)
+            result["server_errors"] = server.errors
+            results.append(result)
+    finally:
+        await server.stop()
+    return results
+
+
+def bench_throughput(args) -> list[dict]:
+    """
+    在本地模拟服务上按参数网格运行真实爬虫，对比吞吐、请求延迟、峰值内存与事件循环卡顿
+    """
+    results = asyncio.run(_run_throughput_grid(args))
+    if args.output:
+        report = {
+            "benchmark": "throughput",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "server": {
+                "list_pages": args.list_pages,
+                "repos_per_page": args.repos_per_page,
+                "latency_ms": args.latency_ms,
+                "latency_dist": args.latency_dist,
+                "graphql_per_repo_ms": args.graphql_per_repo_ms,
+                "error_rate": args.error_rate,
+                "page_kb": args.page_kb,
+                "readme_kb": args.readme_kb,
+                "seed": args.seed,
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RepoPulse benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parse_parser = subparsers.add_parser(
+        "parse", help="Event-loop stall while parsing repo detail pages"
+    )
+    parse_parser.add_argument("--pages", type=int, default=65)
+    parse_parser.set_defaults(handler=bench_parse)
+
+    classify_parser = subparsers.add_parser(
+        "classify", help="Per-repo vs batched topic classification"
+    )
+    classify_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    classify_parser.add_argument("--seed", type=int, default=0)
+    classify_parser.set_defaults(handler=bench_classify)
+
+    imports_parser = subparsers.add_parser(
+        "imports", help="Import-time budget of each main.py mode"
+    )
+    imports_parser.add_argument(
+        "--modes", nargs="+", choices=list(IMPORT_BUDGETS), default=list(IMPORT_BUDGETS)
+    )
+    imports_parser.add_argument("--repeat", type=int, default=5)
+    imports_parser.add_argument(
+        "--budget-scale", type=float, default=1.0, help="Multiply every budget"
+    )
+    imports_parser.set_defaults(handler=bench_imports)
+
+    throughput_parser = subparsers.add_parser(
+        "throughput", help="Crawler throughput against a local GitHub stand-in"
+    )
+    throughput_parser.add_argument("--list-pages", type=int, default=10)
+    throughput_parser.add_argument("--repos-per-page", type=int, default=25)
+    throughput_parser.add_argument(
+        "--tokens", type=int, default=1, help="0 uses the HTML detail pipeline"
+    )
+    throughput_parser.add_argument(
+        "--list-concurrency", type=int, nargs="+", default=[10]
+    )
+    throughput_parser.add_argument(
+        "--detail-concurrency", type=int, nargs="+", default=[16, 65]
+    )
+    throughput_parser.add_argument(
+        "--graphql-batch-size", type=int, nargs="+", default=[10, 25]
+    )
+    throughput_parser.add_argument(
+        "--graphql-concurrency", type=int, nargs="+", default=[2, 4]
+    )
+    throughput_parser.add_argument("--latency-ms", type=float, default=50.0)
+    throughput_parser.add_argument(
+        "--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal"
+    )
+    throughput_parser.add_argument("--graphql-per-repo-ms", type=float, default=20.0)
+    throughput_parser.add_argument("--error-rate", type=float, default=0.0)
+    throughput_parser.add_argument("--page-kb", type=int, default=300)
+    throughput_parser.add_argument("--readme-kb", type=int, default=8)
+    throughput_parser.add_argument("--seed", type=int, default=0)
+    throughput_parser.add_argument(
+        "--output", help="Also write a JSON report with the server settings"
+    )
+    throughput_parser.set_defaults(handler=bench_throughput)
+
+    args = parser.parse_args()
+    results = args.handler(args)
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    if any(result.get("ok") is False for result in results):
+        raise SystemExit(1)
@@ -1,30 +1,98 @@
 import asyncio
 import certifi
+import codecs
+import concurrent.futures
+import contextlib
+import functools
 import os
 import json
 import re
 import socket
 import ssl
+import time
+from email.utils import parsedate_to_datetime
 
 import aiohttp
 from lxml import etree
 
 import config
+from history_store import TIME_RANGES
+from http_cache import ResponseCache
+from readme_store import ReadmeStore, blob_oid
+from replay import ARCHIVE_PATH, CrawlArchive, RecordingSession, ReplaySession
+from repo_cache import RepoCache
+from result_sink import COMPRESSION_SUFFIXES, JsonlSink, ResultSink
+from throttle import (
+    AIMDConcurrencyLimiter,
+    GraphQLBatchController,
+    HostRateLimiter,
+    TokenPool,
+    TokensExhaustedError,
+    backoff_delay,
+)
 
 
 PROXY_URL = "http://127.0.0.1:7890"
 LIST_PAGE_CONCURRENCY = 10
+# 详情页并发由 AIMD 自适应调整：从 INITIAL 起步，在 [MIN, DETAIL_PAGE_CONCURRENCY] 之间变化
 DETAIL_PAGE_CONCURRENCY = 65
-REQUEST_RETRIES = 2
+DETAIL_PAGE_INITIAL_CONCURRENCY = 16
+DETAIL_PAGE_MIN_CONCURRENCY = 2
+REQUEST_RETRIES = 4
 REQUEST_RETRY_DELAY = 0.25
+REQUEST_RETRY_MAX_DELAY = 60.0
+# host -> (每秒请求数, 突发容量)
+HOST_RATE_LIMITS = {
+    "github.com": (30.0, 65),
+    "api.github.com": (10.0, 20),
+}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 GRAPHQL_BATCH_SIZE = 10
 GRAPHQL_CONCURRENCY = 4
+GRAPHQL_MAX_BATCH_SIZE = 50
+GRAPHQL_MAX_CONCURRENCY = 8
+GRAPHQL_TARGET_LATENCY = 3.0
+DETAIL_PAGE_STREAMING = True
+DETAIL_PAGE_MAX_BYTES = 2 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+PARSE_EXECUTOR = "thread"  # thread / process / inline
+PARSE_WORKERS = 4
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_TTL = 300
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+REPO_CACHE_ENABLED = True
+REPO_CACHE_TTL = 6 * 3600
+OUTPUT_COMPRESSION = None  # None / gzip / zstd
+# 录制 / 回放：record 把所有页面与 GraphQL 请求写入存档，replay 只从存档读取不访问网络
+ARCHIVE_MODE = None  # None / record / replay
+REPLAY_LATENCY = {}  # 回放时按 host 模拟的延迟（秒），如 {"github.com": 0.3}
+GITHUB_URL = "https://github.com"
 GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
 USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
     "(KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
 )
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN") or getattr(config, "GitHubToken", "")
+# 多个 token 时 GraphQL 批次会在 token 之间按剩余额度轮换
+GITHUB_TOKENS = list(
+    dict.fromkeys(
+        token
+        for token in [
+            *os.getenv("GITHUB_TOKENS", "").replace(",", " ").split(),
+            *getattr(config, "GitHubTokens", []),
+            GITHUB_TOKEN,
+        ]
+        if token
+    )
+)
+_PARSE_POOL = None
+# lxml 的增量解析器不能在线程之间切换，每个详情页解析器固定在其中一个单线程池中
+_STREAM_PARSE_POOLS = []
+_STREAM_PARSE_COUNTER = 0
+# 进程内所有抓取共享的限速器
+RATE_LIMITER = HostRateLimiter(HOST_RATE_LIMITS)
+# 最近一次抓取的运行摘要（缓存命中、GraphQL 最终 batch size / 并发数等）
+RUN_SUMMARY = {}
 
 
 def keep_latest_repo(data: list[dict]) -> list[dict]:
@@ -61,20 +129,45 @@ def _parse_compact_count(raw: str | None) -> str | None:
     return str(int(value))
 
 
+# XPath 在模块加载时编译一次，解析线程间共享
+_XPATH_LIST_ARTICLES = etree.XPath('//div[@class="Box"]/div[2]/article')
+_XPATH_ARTICLE_AUTHOR = etree.XPath("./h2/a/span/text()")
+_XPATH_ARTICLE_NAME = etree.XPath("./h2/a/text()")
+_XPATH_ARTICLE_DESCRIBE = etree.XPath("./p/text()")
+_XPATH_ARTICLE_LANGUAGE = etree.XPath(
+    'string(.//span[@itemprop="programmingLanguage"])'
+)
+_XPATH_ARTICLE_STARS = etree.XPath("./div[2]/a[1]/text()")
+_XPATH_ARTICLE_FORKS = etree.XPath("./div[2]/a[2]/text()")
+_XPATH_ARTICLE_ADDED_STARS = etree.XPath(
+    './div[2]/span[@class="d-inline-block float-sm-right"]/text()'
+)
+_XPATH_NAV_ANCHORS = etree.XPath('//nav[@aria-label="Repository"]//a[@href]')
+_XPATH_NAV_ANCHOR_CANDIDATES = etree.XPath("@aria-label | .//@aria-label | .//text()")
+_XPATH_FILES_COMMIT = etree.XPath(
+    '//table[@aria-labelledby="folders-and-files"]/tbody/tr[1]'
+    '//span[@class="fgColor-default"]/text()'
+)
+_XPATH_TOPICS = etree.XPath(
+    '//div[contains(@class, "hide-sm") and contains(@class, "hide-md")]/div[@class="my-3"]//a/text()'
+)
+_XPATH_README = etree.XPath('string(//article[contains(@class, "markdown-body")])')
+
+
 def _extract_repo_nav_counts(tree: etree._Element, repo_path: str) -> dict[str, str]:
     counts = {
         "repo_issue": "0",
         "repo_pr": "0",
         "repo_commit": "0",
     }
-    anchors = tree.xpath('//nav[@aria-label="Repository"]//a[@href]')
+    anchors = _XPATH_NAV_ANCHORS(tree)
 
     for anchor in anchors:
         href = anchor.get("href", "")
         if repo_path not in href:
             continue
 
-        candidates = anchor.xpath("@aria-label | .//@aria-label | .//text()")
+        candidates = _XPATH_NAV_ANCHOR_CANDIDATES(anchor)
         count = None
         for candidate in candidates:
             count = _parse_compact_count(candidate)
@@ -93,78 +186,289 @@ def _extract_repo_nav_counts(tree: etree._Element, repo_path: str) -> dict[str,
     return counts
 
 
-def _build_graphql_batch_query(batch: list[dict]) -> str:
-    query_parts = ["query {"]
+def _parse_list_article(article: etree._Element) -> dict:
+    # 仓库作者 / 名称
+    repo_author = _XPATH_ARTICLE_AUTHOR(article)[0].replace(" /", "").strip()
+    repo_name = "".join(_XPATH_ARTICLE_NAME(article)).strip()
+    # 仓库描述
+    describe_texts = _XPATH_ARTICLE_DESCRIBE(article)
+    repo_describe = describe_texts[0].strip() if describe_texts else ""
+    # 仓库语言
+    repo_language = _XPATH_ARTICLE_LANGUAGE(article).strip()
+    # 仓库 stars / forks
+    repo_stars = _XPATH_ARTICLE_STARS(article)[0].strip().replace(",", "")
+    repo_forks = _XPATH_ARTICLE_FORKS(article)[0].strip().replace(",", "")
+    # 今日 stars
+    raw = "".join(_XPATH_ARTICLE_ADDED_STARS(article)).strip()
+    added_stars = raw.replace(",", "").split()[0]
+
+    return {
+        "repo_author": repo_author,
+        "repo_name": repo_name,
+        "repo_describe": repo_describe,
+        "repo_language": repo_language,
+        "repo_stars": repo_stars,
+        "repo_forks": repo_forks,
+        "added_stars": added_stars,
+        "repo_url": f"{GITHUB_URL}/{repo_author}/{repo_name}",
+    }
 
-    for index, repo in enumerate(batch):
-        owner = json.dumps(repo["repo_author"])
-        name = json.dumps(repo["repo_name"])
-        query_parts.append(
-            f"""
-repo_{index}: repository(owner: {owner}, name: {name}) {{
-  description
-  primaryLanguage {{ name }}
+
+def parse_repo_list(html: str) -> dict[str, dict]:
+    tree = etree.HTML(html)
+    repo_urls = {}
+
+    for article in _XPATH_LIST_ARTICLES(tree):
+        repo_info = _parse_list_article(article)
+        repo_urls[f"{repo_info['repo_author']}/{repo_info['repo_name']}"] = repo_info
+    return repo_urls
+
+
+def parse_repo_detail(html: str, repo_path: str) -> dict:
+    return _extract_repo_detail(etree.HTML(html), repo_path)
+
+
+def _extract_repo_detail(tree: etree._Element, repo_path: str) -> dict:
+    repo_counts = _extract_repo_nav_counts(tree, repo_path)
+
+    # 1、获取 commit 数，导航栏没有时从文件列表首行读取
+    repo_commit = repo_counts["repo_commit"]
+    if repo_commit == "0":
+        repo_commit_nodes = _XPATH_FILES_COMMIT(tree)
+        if repo_commit_nodes:
+            parsed = _parse_compact_count(repo_commit_nodes[0])
+            if parsed is not None:
+                repo_commit = parsed
+
+    # 2、获取repo_topics
+    repo_topics = [topic.strip() for topic in _XPATH_TOPICS(tree) if topic.strip()]
+
+    return {
+        "repo_issue": repo_counts["repo_issue"],
+        "repo_pr": repo_counts["repo_pr"],
+        "repo_commit": repo_commit,
+        "repo_topics": repo_topics,
+        "repo_readme": _XPATH_README(tree),
+    }
+
+
+class _DetailStreamParser:
+    """
+    增量解析仓库详情页：导航栏、README 和侧边栏 topics 都已出现时停止读取
+    - 解析器的创建、feed 与 close 都在同一个解析线程中执行，不阻塞事件循环
+    - 每次请求重试前 reset，失败的那次读到的部分页面不会混入结果
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self._pool = _get_stream_parse_pool()
+        self._parser = None
+        self.reset()
+
+    def reset(self):
+        self.fed = False
+        self._restart = True
+
+    async def _call(self, func, *args):
+        if self._pool is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, func, *args)
+
+    async def feed(self, chunk: str) -> bool:
+        self.fed = True
+        return await self._call(self._feed, chunk)
+
+    async def close(self) -> dict:
+        return await self._call(self._close)
+
+    def _feed(self, chunk: str) -> bool:
+        if self._restart:
+            self._parser = etree.HTMLPullParser(events=("end",))
+            self._seen = set()
+            self._restart = False
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if element.tag == "nav" and element.get("aria-label") == "Repository":
+                self._seen.add("nav")
+            elif element.tag == "article" and "markdown-body" in (
+                element.get("class") or ""
+            ):
+                self._seen.add("readme")
+            elif element.tag == "div" and element.get("class") == "my-3":
+                parent_class = (element.getparent().get("class") or "").split()
+                if "hide-sm" in parent_class and "hide-md" in parent_class:
+                    self._seen.add("topics")
+        return len(self._seen) == 3
+
+    def _close(self) -> dict:
+        parser, self._parser = self._parser, None
+        try:
+            root = parser.close()
+        except etree.XMLSyntaxError:
+            root = None
+        if root is None:
+            return parse_repo_detail("<html></html>", self.repo_path)
+        return _extract_repo_detail(root, self.repo_path)
+
+
+def _get_parse_pool() -> concurrent.futures.Executor:
+    global _PARSE_POOL
+
+    if _PARSE_POOL is None:
+        if PARSE_EXECUTOR == "process":
+            _PARSE_POOL = concurrent.futures.ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS
+            )
+        else:
+            _PARSE_POOL = concurrent.futures.ThreadPoolExecutor(
+                max_workers=PARSE_WORKERS, thread_name_prefix="repo-parse"
+            )
+    return _PARSE_POOL
+
+
+def _get_stream_parse_pool() -> concurrent.futures.Executor | None:
+    global _STREAM_PARSE_COUNTER
+
+    if PARSE_EXECUTOR == "inline":
+        return None
+    if not _STREAM_PARSE_POOLS:
+        _STREAM_PARSE_POOLS.extend(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="repo-stream-parse"
+            )
+            for _ in range(PARSE_WORKERS)
+        )
+    _STREAM_PARSE_COUNTER += 1
+    return _STREAM_PARSE_POOLS[_STREAM_PARSE_COUNTER % len(_STREAM_PARSE_POOLS)]
+
+
+async def _run_parser(parser, *args):
+    # HTML 解析是 CPU 密集型操作，放到线程 / 进程池中执行，避免阻塞事件循环
+    if PARSE_EXECUTOR == "inline":
+        return parser(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_parse_pool(), parser, *args)
+
+
+_GRAPHQL_COUNT_FIELDS = """  description
+  primaryLanguage { name }
   stargazerCount
   forkCount
-  openIssues: issues(states: OPEN) {{ totalCount }}
-  openPullRequests: pullRequests(states: OPEN) {{ totalCount }}
-  defaultBranchRef {{
-    target {{
-      ... on Commit {{
-        history(first: 1) {{ totalCount }}
-      }}
-    }}
-  }}
-  repositoryTopics(first: 20) {{
-    nodes {{ topic {{ name }} }}
-  }}
-  readme_md: object(expression: \"HEAD:README.md\") {{
-    ... on Blob {{ isBinary text }}
-  }}
-  readme_md_upper: object(expression: \"HEAD:README.MD\") {{
-    ... on Blob {{ isBinary text }}
-  }}
-  readme_md_lower: object(expression: \"HEAD:readme.md\") {{
-    ... on Blob {{ isBinary text }}
-  }}
-  readme_rst: object(expression: \"HEAD:README.rst\") {{
-    ... on Blob {{ isBinary text }}
-  }}
-  readme_txt: object(expression: \"HEAD:README.txt\") {{
-    ... on Blob {{ isBinary text }}
-  }}
-  readme_plain: object(expression: \"HEAD:README\") {{
-    ... on Blob {{ isBinary text }}
+  openIssues: issues(states: OPEN) { totalCount }
+  openPullRequests: pullRequests(states: OPEN) { totalCount }
+  defaultBranchRef {
+    target {
+      oid
+      ... on Commit {
+        history(first: 1) { totalCount }
+      }
+    }
+  }
+  repositoryTopics(first: 20) {
+    nodes { topic { name } }
+  }
+"""
+# 只查询 README.md 的 blob oid，README 存储中已有该 blob 时无需重新下载正文
+_GRAPHQL_README_OID = """  readmeBlob: object(expression: "HEAD:README.md") {
+    ... on Blob { oid }
+  }
+"""
+# 绝大多数仓库使用 README.md，先只探测一次，未命中的仓库再走 fallback 探测
+_GRAPHQL_README_PRIMARY = ("readme_md", "HEAD:README.md")
+_GRAPHQL_README_FALLBACKS = (
+    ("readme_md_upper", "HEAD:README.MD"),
+    ("readme_md_lower", "HEAD:readme.md"),
+    ("readme_rst", "HEAD:README.rst"),
+    ("readme_txt", "HEAD:README.txt"),
+    ("readme_plain", "HEAD:README"),
+)
+
+
+def _graphql_readme_fields(probes: tuple[tuple[str, str], ...]) -> str:
+    return "".join(
+        f"""  {alias}: object(expression: {json.dumps(expression)}) {{
+    ... on Blob {{ oid isBinary text }}
   }}
-}}
 """
+        for alias, expression in probes
+    )
+
+
+GRAPHQL_PROFILES = {
+    "counts": _GRAPHQL_COUNT_FIELDS + _GRAPHQL_README_OID,
+    "full": _GRAPHQL_COUNT_FIELDS + _graphql_readme_fields((_GRAPHQL_README_PRIMARY,)),
+    "readme": _graphql_readme_fields((_GRAPHQL_README_PRIMARY,)),
+    "readme_fallback": _graphql_readme_fields(_GRAPHQL_README_FALLBACKS),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _build_graphql_batch_query(profile: str, batch_size: int) -> str:
+    variables = ", ".join(
+        f"$owner{index}: String!, $name{index}: String!"
+        for index in range(batch_size)
+    )
+    query_parts = [f"query RepoBatch({variables}) {{"]
+
+    for index in range(batch_size):
+        query_parts.append(
+            f"  repo_{index}: repository(owner: $owner{index}, name: $name{index})"
+            " { ...RepoFields }"
         )
 
+    query_parts.append("  rateLimit { limit cost remaining resetAt }")
     query_parts.append("}")
+    query_parts.append(
+        f"fragment RepoFields on Repository {{\n{GRAPHQL_PROFILES[profile]}}}"
+    )
     return "\n".join(query_parts)
 
 
-def _pick_graphql_readme(repo_node: dict) -> str:
-    candidates = [
-        repo_node.get("readme_md"),
-        repo_node.get("readme_md_upper"),
-        repo_node.get("readme_md_lower"),
-        repo_node.get("readme_rst"),
-        repo_node.get("readme_txt"),
-        repo_node.get("readme_plain"),
+def _build_graphql_variables(batch: list[dict]) -> dict[str, str]:
+    variables = {}
+    for index, repo in enumerate(batch):
+        variables[f"owner{index}"] = repo["repo_author"]
+        variables[f"name{index}"] = repo["repo_name"]
+    return variables
+
+
+def _pick_graphql_readme(repo_node: dict) -> tuple[str, str | None]:
+    """
+    return: (README 正文, blob oid)
+    """
+    aliases = [_GRAPHQL_README_PRIMARY[0]] + [
+        alias for alias, _ in _GRAPHQL_README_FALLBACKS
     ]
 
-    for candidate in candidates:
+    for alias in aliases:
+        candidate = repo_node.get(alias)
         if not candidate or candidate.get("isBinary"):
             continue
         text = candidate.get("text")
         if text:
-            return text
+            return text, candidate.get("oid")
 
-    return ""
+    return "", None
 
 
 def _apply_graphql_repo_data(repo_info: dict, repo_node: dict):
+    if "stargazerCount" in repo_node:
+        _apply_graphql_count_data(repo_info, repo_node)
+    if any(alias.startswith("readme_") for alias in repo_node):
+        readme, readme_oid = _pick_graphql_readme(repo_node)
+        repo_info["repo_readme"] = readme
+        if readme:
+            repo_info["repo_readme_oid"] = readme_oid or blob_oid(readme)
+        else:
+            repo_info.pop("repo_readme_oid", None)
+
+
+def _apply_graphql_count_data(repo_info: dict, repo_node: dict):
+    readme_blob = repo_node.get("readmeBlob") or {}
+    if readme_blob.get("oid"):
+        repo_info["repo_readme_oid"] = readme_blob["oid"]
+
     repo_info["repo_describe"] = repo_node.get("description") or repo_info.get(
         "repo_describe", ""
     )
@@ -187,10 +491,10 @@ def _apply_graphql_repo_data(repo_info: dict, repo_node: dict):
         (repo_node.get("openPullRequests") or {}).get("totalCount") or 0
     )
 
-    commit_history = (
-        (repo_node.get("defaultBranchRef") or {}).get("target") or {}
-    ).get("history") or {}
+    commit_target = (repo_node.get("defaultBranchRef") or {}).get("target") or {}
+    commit_history = commit_target.get("history") or {}
     repo_info["repo_commit"] = str(commit_history.get("totalCount") or 0)
+    repo_info["repo_head_oid"] = commit_target.get("oid")
 
     repo_topics = []
     for node in (repo_node.get("repositoryTopics") or {}).get("nodes", []):
@@ -198,7 +502,71 @@ def _apply_graphql_repo_data(repo_info: dict, repo_node: dict):
         if topic:
             repo_topics.append(topic)
     repo_info["repo_topics"] = repo_topics
-    repo_info["repo_readme"] = _pick_graphql_readme(repo_node)
+
+
+class RetryableStatusError(aiohttp.ClientError):
+    def __init__(
+        self, status: int, delay: float | None = None, reset_at: float | None = None
+    ):
+        super().__init__(f"retryable HTTP status {status}")
+        self.status = status
+        self.delay = delay
+        self.reset_at = reset_at
+
+
+def _check_retryable_status(response: aiohttp.ClientResponse):
+    """
+    429 / 5xx / 403 二级限流时抛出 RetryableStatusError，
+    并记录服务端要求的等待时间（Retry-After 或 X-RateLimit-Reset）
+    """
+    status = response.status
+    headers = response.headers
+    rate_limited = status == 403 and (
+        "Retry-After" in headers or headers.get("X-RateLimit-Remaining") == "0"
+    )
+    if status not in RETRYABLE_STATUSES and not rate_limited:
+        return
+
+    delay = None
+    reset_at = None
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+    if headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+        try:
+            reset_at = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            reset_at = None
+        if delay is None and reset_at is not None:
+            delay = reset_at - time.time()
+
+    raise RetryableStatusError(
+        status, None if delay is None else max(delay, 0.0), reset_at
+    )
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    delay = getattr(exc, "delay", None)
+    if delay is None:
+        return backoff_delay(
+            attempt, base=REQUEST_RETRY_DELAY, cap=REQUEST_RETRY_MAX_DELAY
+        )
+    if delay > REQUEST_RETRY_MAX_DELAY:
+        # 服务端要求的等待超过上限时不再重试，交给上层兜底
+        raise exc
+    return delay
+
+
+class GraphQLBatchError(RuntimeError):
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"GitHub GraphQL error: {errors}")
+        self.errors = errors
 
 
 def _compact_repo_for_disk(repo_info: dict) -> dict:
@@ -208,48 +576,85 @@ def _compact_repo_for_disk(repo_info: dict) -> dict:
 async def _fetch_graphql_batch(
     session: aiohttp.ClientSession,
     batch: list[dict],
-    semaphore: asyncio.Semaphore,
+    controller: GraphQLBatchController,
+    profile: str = "full",
 ) -> list[dict]:
-    query = _build_graphql_batch_query(batch)
+    query = _build_graphql_batch_query(profile, len(batch))
     headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
         "Accept": "application/vnd.github+json",
         "X-GitHub-Api-Version": "2022-11-28",
     }
-    payload = {"query": query}
+    payload = {"query": query, "variables": _build_graphql_variables(batch)}
     last_error = None
 
     for attempt in range(REQUEST_RETRIES):
         try:
-            async with semaphore:
-                async with session.post(
-                    GITHUB_GRAPHQL_URL,
-                    json=payload,
-                    headers=headers,
-                    proxy=PROXY_URL,
-                ) as response:
-                    response.raise_for_status()
-                    body = await response.json()
+            async with controller:
+                token = await controller.tokens.acquire()
+                rate_limit = None
+                try:
+                    await RATE_LIMITER.acquire(GITHUB_GRAPHQL_URL)
+                    started = time.perf_counter()
+                    async with session.post(
+                        GITHUB_GRAPHQL_URL,
+                        json=payload,
+                        headers={**headers, "Authorization": f"Bearer {token}"},
+                        proxy=PROXY_URL,
+                    ) as response:
+                        _check_retryable_status(response)
+                        response.raise_for_status()
+                        body = await response.json()
+                    latency = time.perf_counter() - started
+                    rate_limit = (body.get("data") or {}).get("rateLimit")
+                finally:
+                    controller.tokens.release(token, rate_limit)
         except (
             aiohttp.ClientError,
             asyncio.TimeoutError,
             OSError,
         ) as exc:
             last_error = exc
+            controller.record_failure(profile)
             if attempt == REQUEST_RETRIES - 1:
                 raise
-            await asyncio.sleep(REQUEST_RETRY_DELAY * (attempt + 1))
+            if isinstance(exc, RetryableStatusError):
+                if exc.reset_at is not None:
+                    # 主限流：当前 token 额度耗尽，换 token 立即重试
+                    controller.tokens.park(token, exc.reset_at)
+                    continue
+                if exc.delay is not None:
+                    # 二级限流：整个 host 一起暂停
+                    RATE_LIMITER.pause(GITHUB_GRAPHQL_URL, exc.delay)
+            await asyncio.sleep(_retry_delay(exc, attempt))
             continue
 
-        if body.get("errors"):
-            raise RuntimeError(f"GitHub GraphQL error: {body['errors']}")
+        errors = body.get("errors") or []
+        if any(error.get("type") == "RATE_LIMITED" for error in errors):
+            # 当前 token 额度耗尽，停用到重置时间后换 token 重试
+            controller.tokens.park(token)
+            last_error = TokensExhaustedError(f"GitHub GraphQL error: {errors}")
+            continue
+        if errors:
+            raise GraphQLBatchError(errors)
 
         data = body.get("data") or {}
+        controller.record(
+            profile,
+            size=len(batch),
+            latency=latency,
+            rate_limit=controller.tokens.combined_rate_limit(),
+        )
         enriched = []
+        readme_misses = []
         for index, repo_info in enumerate(batch):
             repo_node = data.get(f"repo_{index}")
             if repo_node:
                 _apply_graphql_repo_data(repo_info, repo_node)
+                if (
+                    _GRAPHQL_README_PRIMARY[0] in repo_node
+                    and repo_node[_GRAPHQL_README_PRIMARY[0]] is None
+                ):
+                    readme_misses.append(repo_info)
             else:
                 repo_info.setdefault("repo_issue", "0")
                 repo_info.setdefault("repo_pr", "0")
@@ -257,264 +662,778 @@ async def _fetch_graphql_batch(
                 repo_info.setdefault("repo_topics", [])
                 repo_info.setdefault("repo_readme", "")
             enriched.append(repo_info)
+
+        if readme_misses:
+            await _fetch_graphql_batch(
+                session, readme_misses, controller, profile="readme_fallback"
+            )
         return enriched
 
     raise last_error
 
 
+def _response_encoding(response: aiohttp.ClientResponse) -> str:
+    # 正文读取之前，Content-Type 中没有 charset 时 aiohttp 无法推断编码并抛出 RuntimeError
+    try:
+        return response.get_encoding()
+    except RuntimeError:
+        return "utf-8"
+
+
+async def _read_body(
+    response: aiohttp.ClientResponse,
+    stream: _DetailStreamParser | None = None,
+    max_bytes: int | None = None,
+) -> tuple[str, bool]:
+    """
+    return: (正文, 是否读完整个响应)
+    """
+    if stream is None and max_bytes is None:
+        return await response.text(), True
+
+    # 分块读取：stream 已拿到所需区块或超过字节预算时提前结束
+    try:
+        decoder_factory = codecs.getincrementaldecoder(_response_encoding(response))
+    except LookupError:
+        decoder_factory = codecs.getincrementaldecoder("utf-8")
+    decoder = decoder_factory(errors="replace")
+    parts = []
+    received = 0
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        received += len(chunk)
+        text = decoder.decode(chunk)
+        parts.append(text)
+        if stream is not None and await stream.feed(text):
+            break
+        if max_bytes is not None and received >= max_bytes:
+            break
+    else:
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts), True
+    return "".join(parts), False
+
+
 async def _fetch_text(
     session: aiohttp.ClientSession,
     url: str,
-    semaphore: asyncio.Semaphore,
+    semaphore: asyncio.Semaphore | AIMDConcurrencyLimiter,
+    cache: ResponseCache | None = None,
+    *,
+    stream: _DetailStreamParser | None = None,
+    max_bytes: int | None = None,
 ) -> str:
+    cached = cache.load(url) if cache is not None else None
+    if cached is not None and cache.is_fresh(cached):
+        return cache.hit(cached)
+
+    request_headers = cache.conditional_headers(cached) if cache is not None else {}
+    limiter = semaphore if isinstance(semaphore, AIMDConcurrencyLimiter) else None
     last_error = None
 
     for attempt in range(REQUEST_RETRIES):
         try:
             async with semaphore:
-                async with session.get(url, proxy=PROXY_URL) as response:
-                    return await response.text()
+                await RATE_LIMITER.acquire(url)
+                started = time.perf_counter()
+                async with session.get(
+                    url, proxy=PROXY_URL, headers=request_headers
+                ) as response:
+                    _check_retryable_status(response)
+                    if limiter is not None:
+                        limiter.record(time.perf_counter() - started)
+                    if stream is not None:
+                        # 丢弃上一次尝试已喂入的部分正文
+                        stream.reset()
+                    if response.status == 304 and cached is not None:
+                        return cache.revalidated(cached)
+                    text, complete = await _read_body(response, stream, max_bytes)
+                    # 提前结束读取的部分正文不能写入缓存，否则之后的 304 会一直返回残缺页面
+                    if cache is not None and response.status == 200 and complete:
+                        cache.store(
+                            url,
+                            text,
+                            etag=response.headers.get("ETag"),
+                            last_modified=response.headers.get("Last-Modified"),
+                        )
+                    return text
         except (
             aiohttp.ClientError,
             asyncio.TimeoutError,
             OSError,
         ) as exc:
             last_error = exc
+            if limiter is not None and isinstance(
+                exc, (RetryableStatusError, asyncio.TimeoutError)
+            ):
+                limiter.record_failure()
             if attempt == REQUEST_RETRIES - 1:
                 raise
-            await asyncio.sleep(REQUEST_RETRY_DELAY * (attempt + 1))
+            if isinstance(exc, RetryableStatusError) and exc.delay is not None:
+                RATE_LIMITER.pause(url, exc.delay)
+            await asyncio.sleep(_retry_delay(exc, attempt))
 
     raise last_error
 
 
-async def _get_repo_details_from_api(
+def _new_graphql_controller() -> GraphQLBatchController:
+    tokens = TokenPool(GITHUB_TOKENS)
+    return GraphQLBatchController(
+        batch_size=GRAPHQL_BATCH_SIZE,
+        concurrency=GRAPHQL_CONCURRENCY * max(len(tokens), 1),
+        max_batch_size=GRAPHQL_MAX_BATCH_SIZE,
+        max_concurrency=GRAPHQL_MAX_CONCURRENCY * max(len(tokens), 1),
+        target_latency=GRAPHQL_TARGET_LATENCY,
+        tokens=tokens,
+    )
+
+
+def _new_detail_limiter() -> AIMDConcurrencyLimiter:
+    return AIMDConcurrencyLimiter(
+        initial=DETAIL_PAGE_INITIAL_CONCURRENCY,
+        min_limit=DETAIL_PAGE_MIN_CONCURRENCY,
+        max_limit=DETAIL_PAGE_CONCURRENCY,
+    )
+
+
+async def _fetch_graphql_batch_isolated(
+    session: aiohttp.ClientSession,
+    batch: list[dict],
+    controller: GraphQLBatchController,
+    profile: str = "full",
+) -> list[dict]:
+    """
+    return: 无法通过 GraphQL 解析的 repo（交给 HTML 兜底）
+    """
+    try:
+        await _fetch_graphql_batch(session, batch, controller, profile)
+    except GraphQLBatchError:
+        # 批次内某个 repo 被重命名 / 删除 / 私有化时，二分定位出问题的 repo
+        if len(batch) == 1:
+            return list(batch)
+        middle = len(batch) // 2
+        halves = await asyncio.gather(
+            _fetch_graphql_batch_isolated(
+                session, batch[:middle], controller, profile
+            ),
+            _fetch_graphql_batch_isolated(
+                session, batch[middle:], controller, profile
+            ),
+        )
+        return [repo_info for half in halves for repo_info in half]
+    except (
+        aiohttp.ClientError,
+        asyncio.TimeoutError,
+        OSError,
+        TokensExhaustedError,
+    ):
+        # 重试后仍失败或所有 token 都被限流，只放弃当前批次
+        return list(batch)
+    return []
+
+
+async def _fetch_graphql_batches(
     session: aiohttp.ClientSession,
     repo_infos: list[dict],
+    controller: GraphQLBatchController,
+    profile: str = "full",
 ) -> list[dict]:
-    graphql_semaphore = asyncio.Semaphore(GRAPHQL_CONCURRENCY)
-    batches = [
-        repo_infos[index : index + GRAPHQL_BATCH_SIZE]
-        for index in range(0, len(repo_infos), GRAPHQL_BATCH_SIZE)
-    ]
-    tasks = [
-        asyncio.create_task(_fetch_graphql_batch(session, batch, graphql_semaphore))
-        for batch in batches
-    ]
+    """
+    return: 无法通过 GraphQL 解析的 repo
+    """
+    pending = list(repo_infos)
+    unresolved = []
+
+    async def worker():
+        # 每次取批时读取当前 batch size，使调整立即作用到后续批次
+        while pending:
+            size = controller.batch_size(profile)
+            batch = pending[:size]
+            del pending[:size]
+            unresolved.extend(
+                await _fetch_graphql_batch_isolated(
+                    session, batch, controller, profile
+                )
+            )
+
+    workers = min(controller.max_concurrency, len(pending))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return unresolved
+
+
+def _update_repo_cache(
+    repo_cache: RepoCache | None, batch: list[dict], unresolved: list[dict]
+):
+    if repo_cache is None:
+        return
+
+    unresolved_ids = {id(repo_info) for repo_info in unresolved}
+    for repo_info in batch:
+        if id(repo_info) not in unresolved_ids and repo_info.get("repo_head_oid"):
+            repo_cache.update(repo_info)
+
+
+async def _enrich_new_batch(
+    session: aiohttp.ClientSession,
+    batch: list[dict],
+    controller: GraphQLBatchController,
+    repo_cache: RepoCache | None,
+) -> list[dict]:
+    unresolved = await _fetch_graphql_batch_isolated(session, batch, controller)
+    _update_repo_cache(repo_cache, batch, unresolved)
+    return unresolved
+
+
+async def _enrich_stale_batch(
+    session: aiohttp.ClientSession,
+    batch: list[dict],
+    controller: GraphQLBatchController,
+    repo_cache: RepoCache,
+    readme_store: ReadmeStore,
+) -> list[dict]:
+    unresolved = await _fetch_graphql_batch_isolated(
+        session, batch, controller, "counts"
+    )
+    unresolved_ids = {id(repo_info) for repo_info in unresolved}
+
+    # README blob 已在存储中，或 HEAD 未变化时复用 README，否则重新下载
+    readme_repos = []
+    for repo_info in batch:
+        if id(repo_info) in unresolved_ids:
+            continue
+        entry = repo_cache.get(repo_info)
+        head_oid = repo_info.get("repo_head_oid")
+        cached_readme_oid = entry["data"].get("repo_readme_oid")
+        if repo_info.get("repo_readme_oid") in readme_store:
+            repo_cache.stats["readme_reused"] += 1
+        elif (
+            head_oid
+            and head_oid == entry.get("head_oid")
+            and (cached_readme_oid is None or cached_readme_oid in readme_store)
+        ):
+            repo_cache.stats["readme_reused"] += 1
+            repo_cache.apply(repo_info, entry, readme_only=True)
+        else:
+            repo_cache.stats["readme_fetched"] += 1
+            readme_repos.append(repo_info)
+    unresolved += await _fetch_graphql_batches(
+        session, readme_repos, controller, "readme"
+    )
+
+    _update_repo_cache(repo_cache, batch, unresolved)
+    return unresolved
+
+
+async def _stream_repo_details_from_api(
+    session: aiohttp.ClientSession,
+    repo_queue: asyncio.Queue,
+    repo_cache: RepoCache | None = None,
+    controller: GraphQLBatchController | None = None,
+    on_complete=None,
+    readme_store: ReadmeStore | None = None,
+) -> tuple[list[dict], list[dict]]:
+    """
+    repo_queue: 列表页解析出的唯一 repo，以 None 结束
+    on_complete: 每个 repo 详情完成后立即回调（HTML 兜底的 repo 除外）
+    return: (repo_infos, 需要走 HTML 兜底的 repo)
+    """
+    if controller is None:
+        controller = _new_graphql_controller()
+    if readme_store is None:
+        readme_store = ReadmeStore()
+
+    repo_infos = []
+    buffers = {"full": [], "counts": []}
+    tasks = []
+
+    async def enrich(profile: str, batch: list[dict]) -> list[dict]:
+        if profile == "counts":
+            unresolved = await _enrich_stale_batch(
+                session, batch, controller, repo_cache, readme_store
+            )
+        else:
+            unresolved = await _enrich_new_batch(session, batch, controller, repo_cache)
+        if on_complete is not None:
+            unresolved_ids = {id(repo_info) for repo_info in unresolved}
+            for repo_info in batch:
+                if id(repo_info) not in unresolved_ids:
+                    on_complete(repo_info)
+        return unresolved
+
+    def dispatch(profile: str):
+        batch = buffers[profile]
+        buffers[profile] = []
+        tasks.append(asyncio.create_task(enrich(profile, batch)))
+
+    # 1、凑满一个 batch 就立即发出，不等待所有列表页返回
+    while (repo_info := await repo_queue.get()) is not None:
+        repo_infos.append(repo_info)
+
+        # 按缓存状态分组：TTL 内直接复用，过期的只刷新计数，未缓存的完整抓取
+        profile = "full"
+        if repo_cache is not None:
+            entry = repo_cache.get(repo_info)
+            if entry is None:
+                repo_cache.stats["miss"] += 1
+            elif repo_cache.is_fresh(entry) and (
+                entry["data"].get("repo_readme_oid") is None
+                or entry["data"]["repo_readme_oid"] in readme_store
+            ):
+                repo_cache.stats["fresh"] += 1
+                repo_cache.apply(repo_info, entry)
+                if on_complete is not None:
+                    on_complete(repo_info)
+                continue
+            else:
+                profile = "counts"
+
+        buffers[profile].append(repo_info)
+        if len(buffers[profile]) >= controller.batch_size(profile):
+            dispatch(profile)
+
+    # 2、列表页全部结束后发出剩余的不满批次
+    for profile, batch in buffers.items():
+        if batch:
+            dispatch(profile)
+
     results = await asyncio.gather(*tasks)
-    return [repo_info for batch in results for repo_info in batch]
+    if repo_cache is not None:
+        repo_cache.save()
+
+    return repo_infos, [repo_info for batch in results for repo_info in batch]
+
+
+async def _get_repo_details_from_api(
+    session: aiohttp.ClientSession,
+    repo_infos: list[dict],
+    repo_cache: RepoCache | None = None,
+    controller: GraphQLBatchController | None = None,
+    readme_store: ReadmeStore | None = None,
+) -> tuple[list[dict], list[dict]]:
+    """
+    return: (repo_infos, 需要走 HTML 兜底的 repo)
+    """
+    repo_queue = asyncio.Queue()
+    for repo_info in repo_infos:
+        repo_queue.put_nowait(repo_info)
+    repo_queue.put_nowait(None)
+    return await _stream_repo_details_from_api(
+        session, repo_queue, repo_cache, controller, readme_store=readme_store
+    )
 
 
 async def _get_repo_details_from_html(
     session: aiohttp.ClientSession,
     repo_infos: list[dict],
-    detail_semaphore: asyncio.Semaphore,
+    detail_limiter: AIMDConcurrencyLimiter,
+    cache: ResponseCache | None = None,
 ) -> list[dict]:
     detail_tasks = [
-        asyncio.create_task(get_repo_detail_info(session, repo_info, detail_semaphore))
+        asyncio.create_task(
+            get_repo_detail_info(session, repo_info, detail_limiter, cache)
+        )
         for repo_info in repo_infos
     ]
     return [await task for task in asyncio.as_completed(detail_tasks)]
 
 
 async def get_repo_url(
-    session: aiohttp.ClientSession, url: str, semaphore: asyncio.Semaphore
+    session: aiohttp.ClientSession,
+    url: str,
+    semaphore: asyncio.Semaphore,
+    cache: ResponseCache | None = None,
 ):
-    html = await _fetch_text(session, url, semaphore)
-
-    tree = etree.HTML(html)
-    articles = tree.xpath('//div[@class="Box"]/div[2]/article')
-
-    repo_urls = {}
-
-    for article in articles:
-        repo_author = (
-            article.xpath("./h2/a/span/text()")[0].replace(" /", "").strip()
-        )  # 仓库作者
-        repo_name = "".join(article.xpath("./h2/a/text()")).strip()  # 仓库名称
-        # 仓库描述
-        if not article.xpath("./p/text()"):
-            repo_describe = ""
-        else:
-            repo_describe = article.xpath("./p/text()")[0].strip()
-        # 仓库语言
-        repo_language = article.xpath(
-            'string(.//span[@itemprop="programmingLanguage"])'
-        ).strip()
-        repo_stars = (
-            article.xpath("./div[2]/a[1]/text()")[0].strip().replace(",", "")
-        )  # 仓库 stars
-        repo_forks = (
-            article.xpath("./div[2]/a[2]/text()")[0].strip().replace(",", "")
-        )  # 仓库 forks
-        # 今日 stars
-        texts = article.xpath(
-            './div[2]/span[@class="d-inline-block float-sm-right"]/text()'
-        )
-        raw = "".join(texts).strip()
-        added_stars = raw.replace(",", "").split()[0]
-
-        # 保存信息
-        repo_urls[f"{repo_author}/{repo_name}"] = {
-            "repo_author": repo_author,
-            "repo_name": repo_name,
-            "repo_describe": repo_describe,
-            "repo_language": repo_language,
-            "repo_stars": repo_stars,
-            "repo_forks": repo_forks,
-            "added_stars": added_stars,
-            "repo_url": f"https://github.com/{repo_author}/{repo_name}",
-        }
-    return repo_urls
+    html = await _fetch_text(session, url, semaphore, cache)
+    return await _run_parser(parse_repo_list, html)
 
 
 async def get_repo_detail_info(
-    session: aiohttp.ClientSession, repo_info: str, semaphore: asyncio.Semaphore
+    session: aiohttp.ClientSession,
+    repo_info: str,
+    semaphore: asyncio.Semaphore | AIMDConcurrencyLimiter,
+    cache: ResponseCache | None = None,
 ):
-    html = await _fetch_text(session, repo_info["repo_url"], semaphore)
-    tree = etree.HTML(html)
-    repo_path = repo_info["repo_url"].replace("https://github.com", "")
-    repo_counts = _extract_repo_nav_counts(tree, repo_path)
+    repo_path = repo_info["repo_url"].replace(GITHUB_URL, "")
+    # 增量解析器的状态无法跨进程传递，进程池解析时整页下载后再解析
+    if not DETAIL_PAGE_STREAMING or PARSE_EXECUTOR == "process":
+        html = await _fetch_text(session, repo_info["repo_url"], semaphore, cache)
+        repo_info.update(await _run_parser(parse_repo_detail, html, repo_path))
+        return repo_info
+
+    # 边下载边解析，拿到所需区块或超过字节预算后停止读取剩余页面
+    stream_parser = _DetailStreamParser(repo_path)
+    html = await _fetch_text(
+        session,
+        repo_info["repo_url"],
+        semaphore,
+        cache,
+        stream=stream_parser,
+        max_bytes=DETAIL_PAGE_MAX_BYTES,
+    )
+    if stream_parser.fed:
+        repo_info.update(await stream_parser.close())
+    else:
+        # 命中缓存时没有经过流式解析
+        repo_info.update(await _run_parser(parse_repo_detail, html, repo_path))
+    return repo_info
+
 
-    # 1、获取issue数
-    repo_info["repo_issue"] = repo_counts["repo_issue"]
+def _trending_urls(languages: list[str] | None, time_range: str) -> list[str]:
+    if languages is None:
+        # 预置一些常见语言的趋势页面
+        return [
+            f"{GITHUB_URL}/trending?since={time_range}",  # 默认 trending页面
+            f"{GITHUB_URL}/trending/python?since={time_range}",  # python trending页面
+            f"{GITHUB_URL}/trending/c++?since={time_range}",  # c++ trending页面
+            f"{GITHUB_URL}/trending/c?since={time_range}",  # c trending页面
+            f"{GITHUB_URL}/trending/java?since={time_range}",  # java trending页面
+            f"{GITHUB_URL}/trending/javascript?since={time_range}",  # javascript trending页面
+            f"{GITHUB_URL}/trending/typescript?since={time_range}",  # typescript trending页面
+            f"{GITHUB_URL}/trending/go?since={time_range}",  # go trending页面
+            f"{GITHUB_URL}/trending/rust?since={time_range}",  # rust trending页面
+            f"{GITHUB_URL}/trending/shell?since={time_range}",  # shell trending页面
+        ]
 
-    # 2、获取Pr数
-    repo_info["repo_pr"] = repo_counts["repo_pr"]
+    article_urls = []
+    for language in dict.fromkeys(languages):
+        article_urls.append(f"{GITHUB_URL}/trending/{language}?since={time_range}")
+    return article_urls
 
-    # 3、获取commit数
-    repo_commit = repo_counts["repo_commit"]
-    if repo_commit == "0":
-        repo_commit_nodes = tree.xpath(
-            '//table[@aria-labelledby="folders-and-files"]/tbody/tr[1]'
-            '//span[@class="fgColor-default"]/text()'
+
+async def enrich_repo_infos(
+    session: aiohttp.ClientSession,
+    repo_infos: list[dict],
+    *,
+    detail_limiter: AIMDConcurrencyLimiter,
+    controller: GraphQLBatchController | None = None,
+    cache: ResponseCache | None = None,
+    repo_cache: RepoCache | None = None,
+    readme_store: ReadmeStore | None = None,
+) -> list[dict]:
+    """
+    不经过列表页，直接补齐一组 repo 的详情（分布式 worker 按批次调用）
+    controller: 有 token 时走 GraphQL，无法解析的 repo 再走 HTML 兜底；为 None 时全部走 HTML
+    """
+    if readme_store is None:
+        readme_store = ReadmeStore()
+
+    unresolved = repo_infos
+    if controller is not None:
+        _, unresolved = await _get_repo_details_from_api(
+            session, repo_infos, repo_cache, controller, readme_store=readme_store
         )
-        if repo_commit_nodes:
-            parsed = _parse_compact_count(repo_commit_nodes[0])
-            if parsed is not None:
-                repo_commit = parsed
-    repo_info["repo_commit"] = repo_commit
+    if unresolved:
+        await _get_repo_details_from_html(session, unresolved, detail_limiter, cache)
 
-    # 4、获取repo_topics
-    repo_topics = tree.xpath(
-        '//div[contains(@class, "hide-sm") and contains(@class, "hide-md")]/div[@class="my-3"]//a/text()'
-    )
-    repo_topics = [topic.strip() for topic in repo_topics if topic.strip()]
-    repo_info["repo_topics"] = repo_topics
+    for repo_info in repo_infos:
+        _store_readme(repo_info, readme_store)
+    return repo_infos
 
-    # 5、获取README.md
-    repo_info["repo_readme"] = tree.xpath(
-        'string(//article[contains(@class, "markdown-body")])'
-    )
 
-    return repo_info
+def trending_sink(time_range: str | None = None) -> JsonlSink:
+    """
+    默认输出：trending.jsonl，指定 time_range 时为 trending_{time_range}.jsonl
+    """
+    name = "trending" if time_range is None else f"trending_{time_range}"
+    suffix = COMPRESSION_SUFFIXES[OUTPUT_COMPRESSION]
+    return JsonlSink(f"{name}.jsonl{suffix}", compression=OUTPUT_COMPRESSION)
 
 
-async def get_trending_async(
-    languages: list[str] | None = None, time_range: str = "daily"
-):
-    if languages is None:
-        # 预置一些常见语言的趋势页面
-        article_urls = [
-            "https://github.com/trending",  # 默认 trending页面
-            f"https://github.com/trending/python?since={time_range}",  # python trending页面
-            f"https://github.com/trending/c++?since={time_range}",  # c++ trending页面
-            f"https://github.com/trending/c?since={time_range}",  # c trending页面
-            f"https://github.com/trending/java?since={time_range}",  # java trending页面
-            f"https://github.com/trending/javascript?since={time_range}",  # javascript trending页面
-            f"https://github.com/trending/typescript?since={time_range}",  # typescript trending页面
-            f"https://github.com/trending/go?since={time_range}",  # go trending页面
-            f"https://github.com/trending/rust?since={time_range}",  # rust trending页面
-            f"https://github.com/trending/shell?since={time_range}",  # shell trending页面
-        ]
-    else:
-        article_urls = []
-        for language in dict.fromkeys(languages):
-            article_urls.append(
-                f"https://github.com/trending/{language}?since={time_range}"
-            )
+def _store_readme(repo_info: dict, readme_store: ReadmeStore):
+    # README 写入存储后立即从内存中释放，需要时按 oid 读取
+    readme = repo_info.pop("repo_readme", None)
+    if readme:
+        repo_info["repo_readme_oid"] = readme_store.put(
+            readme, oid=repo_info.get("repo_readme_oid")
+        )
 
-    headers = {"User-Agent": USER_AGENT, "Cookie": config.Cookie}
+
+def _sync_enriched_fields(repo_info: dict, enriched: dict):
+    # 把详情同步到其它时间范围中的同一 repo，保留各自的 added_stars
+    if enriched is not repo_info:
+        repo_info.update(
+            {key: value for key, value in enriched.items() if key != "added_stars"}
+        )
+
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    创建抓取用的 session，长期运行的调用方可以复用它以保留连接、TLS 会话与 DNS 缓存
+    """
     ssl_context = ssl.create_default_context(cafile=certifi.where())
     connector = aiohttp.TCPConnector(
         ssl=ssl_context,
         family=socket.AF_INET,
         happy_eyeballs_delay=None,
-        limit=DETAIL_PAGE_CONCURRENCY,
+        # 连接池不成为瓶颈，排队时间才不会被详情页限流器误判为服务端变慢
+        limit=DETAIL_PAGE_CONCURRENCY + LIST_PAGE_CONCURRENCY,
         ttl_dns_cache=300,
     )
+    return aiohttp.ClientSession(
+        headers={"User-Agent": USER_AGENT, "Cookie": config.Cookie},
+        connector=connector,
+    )
 
-    list_semaphore = asyncio.Semaphore(LIST_PAGE_CONCURRENCY)
-    detail_semaphore = asyncio.Semaphore(DETAIL_PAGE_CONCURRENCY)
 
-    async with aiohttp.ClientSession(
-        headers=headers,
-        connector=connector,
-    ) as session:
-        seen_repo_paths = set()
+def _open_session(session: aiohttp.ClientSession | None = None):
+    if session is not None:
+        # 调用方持有的 session 在抓取结束后不关闭
+        return contextlib.nullcontext(session)
+    if ARCHIVE_MODE == "replay":
+        return ReplaySession(CrawlArchive.load(ARCHIVE_PATH), latency=REPLAY_LATENCY)
+
+    session = create_session()
+    if ARCHIVE_MODE == "record":
+        return RecordingSession(session, CrawlArchive(ARCHIVE_PATH))
+    return session
+
+
+async def _crawl_trending_async(
+    languages: list[str] | None,
+    time_ranges: list[str],
+    sinks: dict[str, ResultSink] | None = None,
+    session: aiohttp.ClientSession | None = None,
+) -> dict[str, list[dict]]:
+    """
+    sinks: {time_range: ResultSink}，每个 repo 详情完成后立即写出
+    session: 复用调用方的 session，不传时为本次抓取新建
+    """
+    list_semaphore = asyncio.Semaphore(LIST_PAGE_CONCURRENCY)
+    detail_limiter = _new_detail_limiter()
+    # 录制 / 回放时关闭缓存，保证存档覆盖并复现完整的请求序列
+    use_cache = ARCHIVE_MODE is None
+    cache = (
+        ResponseCache(ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES)
+        if HTTP_CACHE_ENABLED and use_cache
+        else None
+    )
+    repo_cache = (
+        RepoCache(ttl=REPO_CACHE_TTL) if REPO_CACHE_ENABLED and use_cache else None
+    )
+    readme_store = ReadmeStore()
+    graphql_controller = _new_graphql_controller() if GITHUB_TOKENS else None
+    RATE_LIMITER.waited = 0.0
+    # 回放不访问网络，延迟由 REPLAY_LATENCY 模拟
+    RATE_LIMITER.enabled = ARCHIVE_MODE != "replay"
+
+    # 每个时间范围各自保存一份 repo（added_stars 不同），详情只对唯一 repo 抓取一次
+    range_repo_infos = {time_range: [] for time_range in time_ranges}
+    range_seen_repos = {time_range: {} for time_range in time_ranges}
+    range_emitted_paths = {time_range: set() for time_range in time_ranges}
+    enriched_repo_infos = {}
+    sinks = sinks or {}
+
+    def emit(time_range: str, repo_info: dict):
+        repo_path = (repo_info["repo_author"], repo_info["repo_name"])
+        _sync_enriched_fields(repo_info, enriched_repo_infos[repo_path])
+        range_emitted_paths[time_range].add(repo_path)
+        if time_range in sinks:
+            sinks[time_range].write(_compact_repo_for_disk(repo_info))
+
+    def complete(enriched: dict):
+        # 详情完成后立即写出到已出现该 repo 的时间范围，之后才出现的在最后补齐
+        _store_readme(enriched, readme_store)
+        repo_path = (enriched["repo_author"], enriched["repo_name"])
+        for time_range, seen_repos in range_seen_repos.items():
+            if repo_path in seen_repos:
+                emit(time_range, seen_repos[repo_path])
+
+    def collect_page(time_range: str, page_repo_infos: dict) -> list[dict]:
+        new_repo_infos = []
+        for repo_info in page_repo_infos.values():
+            repo_path = (repo_info["repo_author"], repo_info["repo_name"])
+            if repo_path in range_seen_repos[time_range]:
+                continue
+            range_seen_repos[time_range][repo_path] = repo_info
+            range_repo_infos[time_range].append(repo_info)
+            if repo_path not in enriched_repo_infos:
+                enriched_repo_infos[repo_path] = repo_info
+                new_repo_infos.append(repo_info)
+        return new_repo_infos
+
+    async def get_range_page(time_range: str, url: str):
+        return time_range, await get_repo_url(session, url, list_semaphore, cache)
+
+    async with _open_session(session) as session:
         list_tasks = [
-            asyncio.create_task(get_repo_url(session, url, list_semaphore))
-            for url in article_urls
+            asyncio.create_task(get_range_page(time_range, url))
+            for time_range in time_ranges
+            for url in _trending_urls(languages, time_range)
         ]
 
-        if GITHUB_TOKEN:
-            # 1、有 token 时先收集唯一 repo，再走 GraphQL 批量详情接口
-            repo_infos = []
+        if GITHUB_TOKENS:
+            # 1、有 token 时边解析列表页边把唯一 repo 送入 GraphQL 批量详情接口
+            repo_queue = asyncio.Queue()
+            details_task = asyncio.create_task(
+                _stream_repo_details_from_api(
+                    session,
+                    repo_queue,
+                    repo_cache,
+                    graphql_controller,
+                    complete,
+                    readme_store,
+                )
+            )
 
             for list_task in asyncio.as_completed(list_tasks):
-                page_repo_infos = await list_task
-                for repo_info in page_repo_infos.values():
-                    repo_path = (repo_info["repo_author"], repo_info["repo_name"])
-                    if repo_path in seen_repo_paths:
-                        continue
-                    seen_repo_paths.add(repo_path)
-                    repo_infos.append(repo_info)
-
-            try:
-                repo_infos = await _get_repo_details_from_api(session, repo_infos)
-            except (
-                aiohttp.ClientError,
-                asyncio.TimeoutError,
-                OSError,
-                RuntimeError,
-            ):
-                repo_infos = await _get_repo_details_from_html(
-                    session, repo_infos, detail_semaphore
-                )
+                for repo_info in collect_page(*await list_task):
+                    repo_queue.put_nowait(repo_info)
+            repo_queue.put_nowait(None)
+
+            _, unresolved = await details_task
+            # 2、只有 GraphQL 无法解析的 repo 才走 HTML 兜底
+            if unresolved:
+                for repo_info in await _get_repo_details_from_html(
+                    session, unresolved, detail_limiter, cache
+                ):
+                    complete(repo_info)
         else:
             # 1、无 token 时保留 HTML 流水线抓取，避免性能回退
             detail_tasks = []
 
             for list_task in asyncio.as_completed(list_tasks):
-                page_repo_infos = await list_task
-                for repo_info in page_repo_infos.values():
-                    repo_path = (repo_info["repo_author"], repo_info["repo_name"])
-                    if repo_path in seen_repo_paths:
-                        continue
-                    seen_repo_paths.add(repo_path)
+                for repo_info in collect_page(*await list_task):
                     detail_tasks.append(
                         asyncio.create_task(
-                            get_repo_detail_info(session, repo_info, detail_semaphore)
+                            get_repo_detail_info(
+                                session, repo_info, detail_limiter, cache
+                            )
                         )
                     )
 
-            repo_infos = [await task for task in asyncio.as_completed(detail_tasks)]
+            for task in asyncio.as_completed(detail_tasks):
+                complete(await task)
 
-    with open("trending.json", "w", encoding="utf-8") as f:
-        compact_repo_infos = [
-            _compact_repo_for_disk(repo_info) for repo_info in repo_infos
-        ]
-        json.dump(compact_repo_infos, f, ensure_ascii=False, separators=(",", ":"))
+    # 3、补齐详情完成后才在其它时间范围出现的 repo
+    for time_range, repo_infos in range_repo_infos.items():
+        for repo_info in repo_infos:
+            repo_path = (repo_info["repo_author"], repo_info["repo_name"])
+            if repo_path not in range_emitted_paths[time_range]:
+                emit(time_range, repo_info)
 
-    return repo_infos
+    if cache is not None:
+        cache.prune()
+
+    RUN_SUMMARY.clear()
+    RUN_SUMMARY["repos"] = len(enriched_repo_infos)
+    RUN_SUMMARY["time_ranges"] = {
+        time_range: len(repo_infos)
+        for time_range, repo_infos in range_repo_infos.items()
+    }
+    if cache is not None:
+        RUN_SUMMARY["http_cache"] = dict(cache.stats)
+    if repo_cache is not None and GITHUB_TOKENS:
+        RUN_SUMMARY["repo_cache"] = dict(repo_cache.stats)
+    RUN_SUMMARY["readme_store"] = dict(readme_store.stats)
+    if ARCHIVE_MODE is not None:
+        RUN_SUMMARY["archive"] = {"mode": ARCHIVE_MODE, "path": str(ARCHIVE_PATH)}
+    RUN_SUMMARY["rate_limiter_wait_s"] = round(RATE_LIMITER.waited, 3)
+    if detail_limiter.requests or detail_limiter.failures:
+        RUN_SUMMARY["detail_concurrency"] = detail_limiter.summary()
+    if graphql_controller is not None:
+        RUN_SUMMARY["graphql"] = graphql_controller.summary()
+        RUN_SUMMARY["graphql"]["html_fallback"] = len(unresolved)
+
+    return range_repo_infos
+
+
+def format_run_summary(summary: dict | None = None) -> str:
+    """
+    最近一次抓取的单行摘要：repo 数、GraphQL 最终 batch size / 并发、详情页收敛的并发上限
+    """
+    summary = RUN_SUMMARY if summary is None else summary
+    repos = f"{summary.get('repos', 0)} repos"
+    time_ranges = ", ".join(
+        f"{time_range} {count}"
+        for time_range, count in summary.get("time_ranges", {}).items()
+    )
+    parts = [f"{repos} ({time_ranges})" if time_ranges else repos]
+    graphql = summary.get("graphql")
+    if graphql:
+        batch_sizes = "/".join(
+            f"{profile} {size}" for profile, size in graphql["batch_sizes"].items()
+        )
+        parts.append(
+            f"graphql batch size {batch_sizes}, concurrency {graphql['concurrency']}, "
+            f"{graphql['failures']} failures, {graphql['html_fallback']} html fallback"
+        )
+    detail = summary.get("detail_concurrency")
+    if detail:
+        parts.append(
+            f"detail concurrency {detail['limit']} (peak {detail['peak']}, "
+            f"{detail['decreases']} decreases, {detail['failures']} failures)"
+        )
+    parts.append(f"rate limiter wait {summary.get('rate_limiter_wait_s', 0)}s")
+    return "crawl summary: " + ", ".join(parts)
 
 
-def get_trending(languages: list[str] | None = None, time_range: str = "daily"):
-    return asyncio.run(get_trending_async(languages, time_range))
+async def get_trending_async(
+    languages: list[str] | None = None,
+    time_range: str = "daily",
+    sink: ResultSink | None = None,
+    session: aiohttp.ClientSession | None = None,
+):
+    """
+    sink: 结果输出，默认逐条写入 trending.jsonl
+    """
+    if sink is None:
+        sink = trending_sink()
+    with sink:
+        range_repo_infos = await _crawl_trending_async(
+            languages, [time_range], {time_range: sink}, session
+        )
+    return range_repo_infos[time_range]
+
+
+async def get_trending_multi_async(
+    languages: list[str] | None = None,
+    time_ranges: list[str] | tuple[str, ...] = TIME_RANGES,
+    sinks: dict[str, ResultSink] | None = None,
+    session: aiohttp.ClientSession | None = None,
+) -> dict[str, list[dict]]:
+    """
+    在同一个 session 中抓取多个时间范围，同一 repo 的详情只抓取一次
+    sinks: {time_range: ResultSink}，默认逐条写入 trending_{time_range}.jsonl
+
+    return: {time_range: [repo_info, ...]}
+    """
+    time_ranges = list(dict.fromkeys(time_ranges))
+    if sinks is None:
+        sinks = {
+            time_range: trending_sink(time_range)
+            for time_range in time_ranges
+        }
 
+    try:
+        range_repo_infos = await _crawl_trending_async(
+            languages, time_ranges, sinks, session
+        )
+    except BaseException:
+        for sink in sinks.values():
+            sink.abort()
+        raise
+    for sink in sinks.values():
+        sink.close()
+    return range_repo_infos
+
+
+def get_trending(
+    languages: list[str] | None = None,
+    time_range: str = "daily",
+    sink: ResultSink | None = None,
+):
+    return asyncio.run(get_trending_async(languages, time_range, sink))
 
-if __name__ == "__main__":
-    import time
 
+def get_trending_multi(
+    languages: list[str] | None = None,
+    time_ranges: list[str] | tuple[str, ...] = TIME_RANGES,
+    sinks: dict[str, ResultSink] | None = None,
+) -> dict[str, list[dict]]:
+    return asyncio.run(get_trending_multi_async(languages, time_ranges, sinks))
+
+
+if __name__ == "__main__":
     start = time.time()
     get_trending()
     print(f"耗时：{time.time() - start}秒")
+    print(json.dumps(RUN_SUMMARY, ensure_ascii=False, indent=2))
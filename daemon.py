@@ -0,0 +1,247 @@
+import asyncio
+import random
+import signal
+import time
+from datetime import datetime, timedelta
+
+import config
+import crawler
+from pipeline import build_topic_heats_async
+
+
+DEFAULT_SCHEDULE = "0 * * * *"
+DEFAULT_JITTER = 60.0
+
+# 分 时 日 月 周（0 为周日）
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _log(message: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> set[int]:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, raw_step = part.split("/", 1)
+            step = int(raw_step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    5 段 cron 表达式：分 时 日 月 周，支持 * , - / 语法
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expression}")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_cron_field(field, low, high)
+            for field, (low, high) in zip(fields, _CRON_RANGES)
+        )
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = dt.isoweekday() % 7 in self.weekdays
+        # 与 cron 一致：日和周都被限定时满足其一即可
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, dt: datetime) -> datetime:
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 4)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)
+                dt = dt.replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"cron expression never fires: {self.expression}")
+
+
+class DaemonJob:
+    def __init__(
+        self,
+        *,
+        name: str,
+        schedule: str,
+        languages: list[str],
+        time_ranges: list[str] | tuple[str, ...],
+        jitter: float = DEFAULT_JITTER,
+    ):
+        self.name = name
+        self.schedule = CronSchedule(schedule)
+        self.languages = languages
+        self.time_ranges = list(time_ranges)
+        self.jitter = jitter
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+
+
+class TrendingDaemon:
+    """
+    常驻进程：复用同一个 aiohttp session 和已加载的话题模型，按 cron 计划运行抓取任务
+    - 每次触发加入 [0, jitter] 秒的随机延迟，避免整点同时请求
+    - 任务运行期间错过的触发点直接跳过，不会排队补跑
+    - 同一时间只运行一次抓取，限流器与运行统计不会被并发任务打乱
+    """
+
+    def __init__(self, jobs: list[DaemonJob]):
+        self.jobs = jobs
+        self._crawl_lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    async def _sleep(self, seconds: float) -> bool:
+        """
+        return: 是否在等待期间收到停止信号
+        """
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(seconds, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run_job(self, job: DaemonJob, session):
+        # 其它任务正在爬取时跳过本次触发，而不是排队等它结束
+        if self._crawl_lock.locked():
+            job.skipped += 1
+            _log(f"job {job.name} skipped: another crawl is still running")
+            return
+        async with self._crawl_lock:
+            started = time.monotonic()
+            try:
+                topic_heats = await build_topic_heats_async(
+                    languages=job.languages,
+                    time_ranges=job.time_ranges,
+                    session=session,
+                )
+            except Exception as exc:
+                job.failures += 1
+                _log(f"job {job.name} failed: {exc!r}")
+                return
+
+            job.runs += 1
+            _log(
+                f"job {job.name} finished in {time.monotonic() - started:.1f}s: "
+                f"{crawler.RUN_SUMMARY.get('repos', 0)} repos, "
+                + ", ".join(
+                    f"{time_range} {len(topic_heat)} topics"
+                    for time_range, topic_heat in topic_heats.items()
+                )
+            )
+            _log(f"job {job.name} {crawler.format_run_summary()}")
+
+    async def _job_loop(self, job: DaemonJob, session):
+        while not self._stop.is_set():
+            now = datetime.now()
+            next_run = job.schedule.next_after(now)
+            delay = (next_run - now).total_seconds() + random.uniform(0, job.jitter)
+            _log(f"job {job.name} next run at {next_run:%Y-%m-%d %H:%M}")
+            if await self._sleep(delay):
+                return
+
+            await self._run_job(job, session)
+
+            missed = 0
+            fire_at = job.schedule.next_after(next_run)
+            while fire_at <= datetime.now():
+                missed += 1
+                fire_at = job.schedule.next_after(fire_at)
+            if missed:
+                job.skipped += missed
+                _log(f"job {job.name} skipped {missed} overlapping run(s)")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+
+        async with crawler.create_session() as session:
+            await asyncio.gather(*(self._job_loop(job, session) for job in self.jobs))
+        _log("daemon stopped")
+
+
+def load_jobs(
+    *,
+    languages: list[str],
+    time_ranges: list[str] | tuple[str, ...],
+    schedule: str = DEFAULT_SCHEDULE,
+    jitter: float = DEFAULT_JITTER,
+) -> list[DaemonJob]:
+    """
+    优先使用 config.DaemonJobs，例如：
+    DaemonJobs = [
+        {"name": "hourly", "schedule": "5 * * * *", "time_range": "daily"},
+        {"name": "nightly", "schedule": "30 2 * * *", "time_range": "all"},
+    ]
+    未配置时按命令行参数生成单个任务
+    """
+    job_configs = getattr(config, "DaemonJobs", None) or [
+        {"name": "default", "schedule": schedule, "time_range": list(time_ranges)}
+    ]
+
+    jobs = []
+    for index, job_config in enumerate(job_configs):
+        job_time_range = job_config.get("time_range", "daily")
+        if job_time_range == "all":
+            job_time_ranges = crawler.TIME_RANGES
+        elif isinstance(job_time_range, str):
+            job_time_ranges = [job_time_range]
+        else:
+            job_time_ranges = job_time_range
+
+        jobs.append(
+            DaemonJob(
+                name=job_config.get("name") or f"job{index}",
+                schedule=job_config.get("schedule", schedule),
+                languages=job_config.get("languages", languages),
+                time_ranges=job_time_ranges,
+                jitter=float(job_config.get("jitter", jitter)),
+            )
+        )
+    return jobs
+
+
+def run_daemon(
+    *,
+    languages: list[str],
+    time_ranges: list[str] | tuple[str, ...],
+    schedule: str = DEFAULT_SCHEDULE,
+    jitter: float = DEFAULT_JITTER,
+):
+    jobs = load_jobs(
+        languages=languages, time_ranges=time_ranges, schedule=schedule, jitter=jitter
+    )
+    asyncio.run(TrendingDaemon(jobs).run())
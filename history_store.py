@@ -1,10 +1,52 @@
 import json
+import sqlite3
+from contextlib import closing
 from datetime import datetime, timezone
 from pathlib import Path
 
 
 HISTORY_DIR = Path("history")
 SNAPSHOT_DIR = HISTORY_DIR / "topic_snapshots"
+REPO_DB_PATH = HISTORY_DIR / "repo_snapshots.sqlite3"
+TIME_RANGES = ("daily", "weekly", "monthly")
+
+_REPO_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    time_range TEXT NOT NULL,
+    languages TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repo_snapshots (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    repo TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    time_range TEXT NOT NULL,
+    language TEXT,
+    stars INTEGER,
+    forks INTEGER,
+    added_stars INTEGER,
+    issues INTEGER,
+    prs INTEGER,
+    commits INTEGER,
+    topics TEXT,
+    description TEXT,
+    readme_oid TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_repo_snapshots_repo
+    ON repo_snapshots (repo, created_at);
+CREATE INDEX IF NOT EXISTS idx_repo_snapshots_time_range
+    ON repo_snapshots (time_range, created_at);
+CREATE INDEX IF NOT EXISTS idx_repo_snapshots_run
+    ON repo_snapshots (run_id);
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    keywords_hash TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    PRIMARY KEY (keywords_hash, run_id)
+);
+"""
+# 旧数据库中缺少的列，连接时补齐
+_REPO_DB_ADDED_COLUMNS = {"description": "TEXT", "readme_oid": "TEXT"}
 
 
 def normalize_languages(languages: list[str] | None) -> list[str]:
@@ -18,9 +60,10 @@ def save_topic_snapshot(
     *,
     time_range: str,
     languages: list[str] | None,
+    created_at: datetime | None = None,
 ) -> Path:
     SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
-    created_at = datetime.now(timezone.utc)
+    created_at = created_at or datetime.now(timezone.utc)
     payload = {
         "created_at": created_at.isoformat(),
         "time_range": time_range,
@@ -37,13 +80,36 @@ def save_topic_snapshot(
     snapshot_path = (
         SNAPSHOT_DIR / f"{created_at.strftime('%Y%m%dT%H%M%S_%fZ')}__{time_range}.json"
     )
-    snapshot_path.write_text(
+    # 先写临时文件再重命名，读取方不会看到写了一半的快照
+    tmp_path = snapshot_path.with_suffix(".tmp")
+    tmp_path.write_text(
         json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
         encoding="utf-8",
     )
+    tmp_path.replace(snapshot_path)
     return snapshot_path
 
 
+def load_latest_topic_snapshot(
+    *,
+    time_range: str,
+    languages: list[str] | None,
+) -> dict | None:
+    if not SNAPSHOT_DIR.exists():
+        return None
+
+    normalized_languages = normalize_languages(languages)
+    # 文件名以创建时间开头，倒序找到的第一个匹配即最新快照
+    for path in sorted(SNAPSHOT_DIR.glob(f"*__{time_range}.json"), reverse=True):
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        if payload.get("languages") == normalized_languages:
+            return payload
+    return None
+
+
 def load_topic_history(
     topic_name: str,
     *,
@@ -151,3 +217,239 @@ def load_all_topic_histories(
             histories[topic_name] = history
 
     return histories
+
+
+def _connect_repo_db(path: Path | None = None) -> sqlite3.Connection:
+    path = Path(path or REPO_DB_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_REPO_DB_SCHEMA)
+    columns = {
+        row["name"] for row in conn.execute("PRAGMA table_info(repo_snapshots)")
+    }
+    for column, column_type in _REPO_DB_ADDED_COLUMNS.items():
+        if column not in columns:
+            conn.execute(
+                f"ALTER TABLE repo_snapshots ADD COLUMN {column} {column_type}"
+            )
+    return conn
+
+
+def _repo_key(repo: dict | str) -> str:
+    if isinstance(repo, str):
+        return repo.lower()
+    return f"{repo['repo_author']}/{repo['repo_name']}".lower()
+
+
+def _count(raw) -> int | None:
+    if raw is None:
+        return None
+    raw = str(raw).replace(",", "").strip()
+    return int(raw) if raw.isdigit() else None
+
+
+def save_repo_snapshot(
+    repo_infos: list[dict],
+    *,
+    time_range: str,
+    languages: list[str] | None,
+    created_at: datetime | None = None,
+    db_path: Path | None = None,
+) -> int:
+    """
+    把本次抓取的每个 repo 记录写入 SQLite，所有行在同一个事务中批量插入
+
+    return: run_id
+    """
+    created_at = (created_at or datetime.now(timezone.utc)).isoformat()
+    with closing(_connect_repo_db(db_path)) as conn, conn:
+        run_id = conn.execute(
+            "INSERT INTO runs (created_at, time_range, languages) VALUES (?, ?, ?)",
+            (
+                created_at,
+                time_range,
+                json.dumps(normalize_languages(languages), ensure_ascii=False),
+            ),
+        ).lastrowid
+        conn.executemany(
+            """INSERT INTO repo_snapshots (
+                run_id, repo, created_at, time_range, language, stars, forks,
+                added_stars, issues, prs, commits, topics, description, readme_oid
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    run_id,
+                    _repo_key(repo_info),
+                    created_at,
+                    time_range,
+                    repo_info.get("repo_language"),
+                    _count(repo_info.get("repo_stars")),
+                    _count(repo_info.get("repo_forks")),
+                    _count(repo_info.get("added_stars")),
+                    _count(repo_info.get("repo_issue")),
+                    _count(repo_info.get("repo_pr")),
+                    _count(repo_info.get("repo_commit")),
+                    json.dumps(repo_info.get("repo_topics") or [], ensure_ascii=False),
+                    repo_info.get("repo_describe"),
+                    repo_info.get("repo_readme_oid"),
+                )
+                for repo_info in repo_infos
+            ],
+        )
+    return run_id
+
+
+def load_repo_star_series(
+    repo: dict | str,
+    *,
+    time_range: str | None = None,
+    limit: int = 20,
+    db_path: Path | None = None,
+) -> list[dict]:
+    """
+    repo: "owner/name" 或 repo_info
+    return: 按时间升序的 [{timestamp, time_range, stars, forks, added_stars}, ...]
+    """
+    query = (
+        "SELECT created_at, time_range, stars, forks, added_stars "
+        "FROM repo_snapshots WHERE repo = ?"
+    )
+    params = [_repo_key(repo)]
+    # 只读查询：数据库不存在时不创建（API 的 GET 请求不应写入文件）
+    if not Path(db_path or REPO_DB_PATH).exists():
+        return []
+    if time_range is not None:
+        query += " AND time_range = ?"
+        params.append(time_range)
+    query += " ORDER BY created_at DESC LIMIT ?"
+    params.append(limit)
+
+    with closing(_connect_repo_db(db_path)) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    return [
+        {
+            "timestamp": row["created_at"],
+            "time_range": row["time_range"],
+            "stars": row["stars"],
+            "forks": row["forks"],
+            "added_stars": row["added_stars"],
+        }
+        for row in reversed(rows)
+    ]
+
+
+def load_latest_repo_snapshot(
+    *,
+    time_range: str,
+    languages: list[str] | None,
+    db_path: Path | None = None,
+) -> list[dict]:
+    """
+    读取最近一次抓取的全部 repo 记录，可用于重新计算话题热度
+    """
+    if not Path(db_path or REPO_DB_PATH).exists():
+        return []
+    with closing(_connect_repo_db(db_path)) as conn:
+        run = conn.execute(
+            "SELECT id FROM runs WHERE time_range = ? AND languages = ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (
+                time_range,
+                json.dumps(normalize_languages(languages), ensure_ascii=False),
+            ),
+        ).fetchone()
+        if run is None:
+            return []
+        rows = conn.execute(
+            "SELECT * FROM repo_snapshots WHERE run_id = ?", (run["id"],)
+        ).fetchall()
+
+    return [
+        {
+            **{key: row[key] for key in row.keys() if key != "topics"},
+            "topics": json.loads(row["topics"] or "[]"),
+        }
+        for row in rows
+    ]
+
+
+def list_repo_runs(db_path: Path | None = None) -> list[dict]:
+    """
+    return: 按时间升序的 [{id, created_at, time_range, languages, legacy}, ...]
+    legacy: 添加 description / readme_oid 列之前写入的运行，其话题快照时间戳与运行时间不一致
+    """
+    with closing(_connect_repo_db(db_path)) as conn:
+        rows = conn.execute(
+            """SELECT id, created_at, time_range, languages, NOT EXISTS (
+                SELECT 1 FROM repo_snapshots
+                WHERE run_id = runs.id
+                    AND (description IS NOT NULL OR readme_oid IS NOT NULL)
+            ) AS legacy
+            FROM runs ORDER BY created_at, id"""
+        ).fetchall()
+    return [
+        {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "time_range": row["time_range"],
+            "languages": json.loads(row["languages"]),
+            "legacy": bool(row["legacy"]),
+        }
+        for row in rows
+    ]
+
+
+def load_run_repo_infos(run_id: int, db_path: Path | None = None) -> list[dict]:
+    """
+    把某次运行的 repo 记录还原为抓取结果的字段格式，可直接重新打标签和计算热度
+    """
+    with closing(_connect_repo_db(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT * FROM repo_snapshots WHERE run_id = ?", (run_id,)
+        ).fetchall()
+
+    repo_infos = []
+    for row in rows:
+        author, _, name = row["repo"].partition("/")
+        repo_infos.append(
+            {
+                "repo_author": author,
+                "repo_name": name,
+                "repo_describe": row["description"] or "",
+                "repo_language": row["language"],
+                "repo_stars": row["stars"],
+                "repo_forks": row["forks"],
+                "added_stars": row["added_stars"],
+                "repo_issue": row["issues"],
+                "repo_pr": row["prs"],
+                "repo_commit": row["commits"],
+                "repo_topics": json.loads(row["topics"] or "[]"),
+                "repo_readme_oid": row["readme_oid"],
+            }
+        )
+    return repo_infos
+
+
+def load_backfilled_runs(keywords_hash: str, db_path: Path | None = None) -> set[int]:
+    with closing(_connect_repo_db(db_path)) as conn:
+        return {
+            row["run_id"]
+            for row in conn.execute(
+                "SELECT run_id FROM backfill_progress WHERE keywords_hash = ?",
+                (keywords_hash,),
+            )
+        }
+
+
+def mark_runs_backfilled(
+    keywords_hash: str, run_ids: list[int], db_path: Path | None = None
+):
+    with closing(_connect_repo_db(db_path)) as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO backfill_progress (keywords_hash, run_id) "
+            "VALUES (?, ?)",
+            [(keywords_hash, run_id) for run_id in run_ids],
+        )
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+
+CACHE_DIR = Path("cache") / "http"
+DEFAULT_TTL = 300
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    按 URL 存储的磁盘响应缓存：
+    - TTL 内直接命中，不发请求
+    - 过期后带 If-None-Match / If-Modified-Since 重新验证，304 时复用正文
+    - 总体积超过 max_bytes 时按最近访问时间淘汰
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        *,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"fresh": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+
+    def _entry_path(self, url: str) -> Path:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def load(self, url: str) -> dict | None:
+        path = self._entry_path(url)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if entry.get("url") != url:
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - float(entry.get("stored_at") or 0) < self.ttl
+
+    def conditional_headers(self, entry: dict | None) -> dict[str, str]:
+        if not entry:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, entry: dict) -> str:
+        self.stats["fresh"] += 1
+        self._entry_path(entry["url"]).touch(exist_ok=True)
+        return entry["body"]
+
+    def revalidated(self, entry: dict) -> str:
+        # 304：正文不变，只刷新存储时间
+        self.stats["revalidated"] += 1
+        entry["stored_at"] = time.time()
+        self._write(entry)
+        return entry["body"]
+
+    def store(
+        self,
+        url: str,
+        body: str,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ):
+        self.stats["stored"] += 1
+        self._write(
+            {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "stored_at": time.time(),
+                "body": body,
+            }
+        )
+
+    def _write(self, entry: dict):
+        path = self._entry_path(entry["url"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":")),
+            encoding="utf-8",
+        )
+        tmp_path.replace(path)
+
+    def prune(self) -> int:
+        if not self.cache_dir.exists():
+            return 0
+
+        entries = []
+        total_size = 0
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+
+        self.stats["evicted"] += removed
+        return removed
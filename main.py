@@ -1,28 +1,19 @@
-import json
 import argparse
 
-from analysis import tag_repo, aggregate_by_topic_score
-from cli import print_all_topic_trends_cli_rich, print_topics_cli_rich
-from crawler import get_trending
-from history_store import load_all_topic_histories, save_topic_snapshot
-from topic import compute_topic_heat
+from history_store import TIME_RANGES, load_all_topic_histories
 
+# 各模式只在分支内导入自己用到的模块：--trending local 只读取历史快照，
+# 不需要加载 numpy、aiohttp 和 lxml；对应参数的默认值由各模块自己定义
 
-def build_topic_heat(*, languages: list[str], time_range: str) -> dict:
-    data = get_trending(languages=languages, time_range=time_range)
-    if data is None:
-        with open("trending.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
 
-    tagged = [tag_repo(repo) for repo in data]
-    buckets = aggregate_by_topic_score(tagged)
-    topic_heat = compute_topic_heat(buckets)
-    save_topic_snapshot(
-        topic_heat,
-        time_range=time_range,
-        languages=languages,
-    )
-    return topic_heat
+def print_histories(time_ranges, *, languages: list[str], limit: int):
+    from cli import print_all_topic_trends_cli_rich
+
+    for time_range in time_ranges:
+        histories = load_all_topic_histories(
+            time_range=time_range, languages=languages, limit=limit
+        )
+        print_all_topic_trends_cli_rich(histories, time_range=time_range)
 
 
 if __name__ == "__main__":
@@ -33,10 +24,10 @@ if __name__ == "__main__":
     # time range（分析时间范围）
     parser.add_argument(
         "--time-range",
-        choices=["daily", "weekly", "monthly"],
+        choices=[*TIME_RANGES, "all"],
         default="daily",
-        help="Time range for analysis (daily/weekly/monthly) (default: daily)\n"
-        "分析时间范围 (daily/weekly/monthly)",
+        help="Time range for analysis (daily/weekly/monthly/all) (default: daily)\n"
+        "分析时间范围 (daily/weekly/monthly)，all 表示在一次抓取中同时分析三个范围",
     )
 
     # languages (语言列表)
@@ -88,33 +79,193 @@ if __name__ == "__main__":
         help="Number of history points to show in trending mode (default: 20)\n",
     )
 
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and crawl on a cron schedule with a persistent session\n"
+        "常驻运行，按 cron 计划抓取并写入历史快照（任务可在 config.DaemonJobs 中配置）",
+    )
+
+    parser.add_argument(
+        "--schedule",
+        help="Cron schedule for --daemon (default: daemon.DEFAULT_SCHEDULE)\n",
+    )
+
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        help="Random delay in seconds added to each scheduled run "
+        "(default: daemon.DEFAULT_JITTER)\n",
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve topic heat and histories as a JSON HTTP API\n"
+        "以 HTTP JSON 接口提供最新话题热度与历史趋势查询",
+    )
+
+    parser.add_argument(
+        "--host",
+        help="Bind address for --serve (default: api.DEFAULT_HOST)\n",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="Port for --serve (default: api.DEFAULT_PORT)\n",
+    )
+
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Split a crawl into list-page / enrichment units in the work queue\n"
+        "把一次抓取拆分成列表页 / 详情批次单元写入工作队列，由 --worker 进程执行",
+    )
+
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Lease and crawl units from the work queue until it drains\n"
+        "从工作队列领取单元抓取，所有单元完成后合并结果并保存历史快照",
+    )
+
+    parser.add_argument(
+        "--queue",
+        help="SQLite work queue shared by --enqueue / --worker "
+        "(default: work_queue.QUEUE_PATH)\n",
+    )
+
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Re-tag stored repo records with the current TOPIC_KEYWORDS and "
+        "regenerate topic history snapshots (resumable)\n"
+        "用当前的话题关键词重新分类已存储的 repo 记录并重建话题历史，中断后可继续",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for --backfill (default: number of CPUs)\n",
+    )
+
+    parser.add_argument(
+        "--build-topic-model",
+        action="store_true",
+        help="Compile TOPIC_KEYWORDS into the memory-mapped topic model artifact\n"
+        "按当前的话题关键词预编译话题模型（关键词变化后运行时也会自动重新编译）",
+    )
+
+    parser.add_argument(
+        "--record",
+        metavar="ARCHIVE",
+        help="Record every fetched page and GraphQL response into ARCHIVE\n"
+        "录制本次抓取的所有页面与 GraphQL 响应到存档文件",
+    )
+
+    parser.add_argument(
+        "--replay",
+        metavar="ARCHIVE",
+        help="Serve the crawl from a recorded ARCHIVE without network access\n"
+        "从录制的存档回放抓取，不访问网络",
+    )
+
     args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if args.serve and args.time_range == "all":
+        # 接口按请求的 time_range 参数查询，--time-range 只是默认值
+        parser.error("--serve needs a single --time-range as the default range")
+    if args.record or args.replay:
+        import crawler
 
-    if args.trending == "local":
-        histories = load_all_topic_histories(
-            time_range=args.time_range,
+        crawler.ARCHIVE_MODE = "record" if args.record else "replay"
+        crawler.ARCHIVE_PATH = args.record or args.replay
+    time_ranges = TIME_RANGES if args.time_range == "all" else [args.time_range]
+
+    if args.build_topic_model:
+        from analysis import build_topic_model
+
+        print(build_topic_model(force=True))
+        raise SystemExit(0)
+
+    if args.serve:
+        from api import DEFAULT_HOST, DEFAULT_PORT, run_api_server
+
+        run_api_server(
             languages=args.languages,
-            limit=args.history_limit,
+            time_range=time_ranges[0],
+            host=args.host or DEFAULT_HOST,
+            port=DEFAULT_PORT if args.port is None else args.port,
         )
-        print_all_topic_trends_cli_rich(histories, time_range=args.time_range)
         raise SystemExit(0)
 
-    if args.trending == "web":
-        build_topic_heat(languages=args.languages, time_range=args.time_range)
-        histories = load_all_topic_histories(
-            time_range=args.time_range,
+    if args.backfill:
+        from backfill import backfill_topic_history
+
+        print(backfill_topic_history(workers=args.workers))
+        raise SystemExit(0)
+
+    if args.enqueue or args.worker:
+        from work_queue import QUEUE_PATH, enqueue_crawl, run_worker
+
+        queue_path = args.queue or QUEUE_PATH
+        if args.enqueue:
+            job_id = enqueue_crawl(
+                languages=args.languages, time_ranges=time_ranges, path=queue_path
+            )
+            print(f"enqueued job {job_id} into {queue_path}")
+        if args.worker:
+            run_worker(path=queue_path)
+        raise SystemExit(0)
+
+    if args.daemon:
+        from daemon import DEFAULT_JITTER, DEFAULT_SCHEDULE, run_daemon
+
+        run_daemon(
             languages=args.languages,
-            limit=args.history_limit,
+            time_ranges=time_ranges,
+            schedule=args.schedule or DEFAULT_SCHEDULE,
+            jitter=DEFAULT_JITTER if args.jitter is None else args.jitter,
         )
-        print_all_topic_trends_cli_rich(histories, time_range=args.time_range)
         raise SystemExit(0)
 
+    if args.trending == "local":
+        print_histories(time_ranges, languages=args.languages, limit=args.history_limit)
+        raise SystemExit(0)
+
+    from crawler import format_run_summary
+    from pipeline import build_topic_heat, build_topic_heats
+
+    if args.trending == "web":
+        if args.time_range == "all":
+            build_topic_heats(languages=args.languages, time_ranges=time_ranges)
+        else:
+            build_topic_heat(languages=args.languages, time_range=args.time_range)
+        print(format_run_summary())
+        print_histories(time_ranges, languages=args.languages, limit=args.history_limit)
+        raise SystemExit(0)
+
+    from cli import print_topics_cli_rich
+
     # 1. 获取 trending
-    topic_heat = build_topic_heat(languages=args.languages, time_range=args.time_range)
+    if args.time_range == "all":
+        topic_heats = build_topic_heats(
+            languages=args.languages, time_ranges=time_ranges
+        )
+    else:
+        topic_heats = {
+            args.time_range: build_topic_heat(
+                languages=args.languages, time_range=args.time_range
+            )
+        }
+    print(format_run_summary())
     # # 3. 打印结果
-    print_topics_cli_rich(
-        topic_heat,
-        top_k_topics=args.top_k_topics,
-        top_k_repos=args.top_k_repos,
-        time_range=args.time_range,
-    )
+    for time_range, topic_heat in topic_heats.items():
+        print_topics_cli_rich(
+            topic_heat,
+            top_k_topics=args.top_k_topics,
+            top_k_repos=args.top_k_repos,
+            time_range=time_range,
+        )
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timezone
+
+import aiohttp
+
+from analysis import TAG_BATCH_SIZE, TaggingSink, aggregate_by_topic_score
+from crawler import (
+    TIME_RANGES,
+    get_trending,
+    get_trending_multi_async,
+    trending_sink,
+)
+from history_store import save_repo_snapshot, save_topic_snapshot
+from topic import compute_topic_heat
+
+
+def _topic_heat_from_tagged(
+    tagged: list[dict], *, languages: list[str], time_range: str
+) -> dict:
+    buckets = aggregate_by_topic_score(tagged)
+    topic_heat = compute_topic_heat(buckets)
+    # 话题快照与 repo 记录使用同一时间戳，回填时可以按运行找到对应的快照
+    created_at = datetime.now(timezone.utc)
+    save_topic_snapshot(
+        topic_heat,
+        time_range=time_range,
+        languages=languages,
+        created_at=created_at,
+    )
+    save_repo_snapshot(
+        tagged, time_range=time_range, languages=languages, created_at=created_at
+    )
+    return topic_heat
+
+
+def build_topic_heat(*, languages: list[str], time_range: str) -> dict:
+    # 每个 repo 详情完成后立即打标签，README 打完分即释放
+    sink = TaggingSink(trending_sink())
+    get_trending(languages=languages, time_range=time_range, sink=sink)
+    return _topic_heat_from_tagged(
+        sink.repos, languages=languages, time_range=time_range
+    )
+
+
+async def build_topic_heats_async(
+    *,
+    languages: list[str],
+    time_ranges: list[str] | tuple[str, ...] = TIME_RANGES,
+    session: aiohttp.ClientSession | None = None,
+) -> dict[str, dict]:
+    # 一次会话抓取多个时间范围，每个范围分别计算热度并保存快照
+    tag_cache = {}
+    sinks = {
+        time_range: TaggingSink(trending_sink(time_range), tag_cache=tag_cache)
+        for time_range in dict.fromkeys(time_ranges)
+    }
+    await get_trending_multi_async(
+        languages=languages, time_ranges=time_ranges, sinks=sinks, session=session
+    )
+    return {
+        time_range: _topic_heat_from_tagged(
+            sink.repos, languages=languages, time_range=time_range
+        )
+        for time_range, sink in sinks.items()
+    }
+
+
+def build_topic_heats_from_repos(
+    range_repo_infos: dict[str, list[dict]],
+    *,
+    languages: list[str],
+    before_save=None,
+) -> dict[str, dict]:
+    """
+    已抓取完成的 repo（如队列 worker 合并后的结果）打标签、计算热度并保存快照
+    before_save: 所有范围打完标签、写入快照之前调用，抛出异常即放弃写入
+    """
+    tag_cache = {}
+    range_tagged = {}
+    for time_range, repo_infos in range_repo_infos.items():
+        with TaggingSink(
+            trending_sink(time_range), tag_cache=tag_cache, batch_size=TAG_BATCH_SIZE
+        ) as sink:
+            for repo_info in repo_infos:
+                sink.write(repo_info)
+        range_tagged[time_range] = sink.repos
+
+    if before_save is not None:
+        before_save()
+    return {
+        time_range: _topic_heat_from_tagged(
+            tagged, languages=languages, time_range=time_range
+        )
+        for time_range, tagged in range_tagged.items()
+    }
+
+
+def build_topic_heats(
+    *, languages: list[str], time_ranges: list[str] | tuple[str, ...] = TIME_RANGES
+) -> dict[str, dict]:
+    return asyncio.run(
+        build_topic_heats_async(languages=languages, time_ranges=time_ranges)
+    )
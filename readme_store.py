@@ -0,0 +1,54 @@
+import hashlib
+import os
+import zlib
+from pathlib import Path
+
+
+README_DIR = Path("cache") / "readmes"
+
+
+def blob_oid(text: str) -> str:
+    # 与 git blob oid 的计算方式一致，GraphQL 返回的 oid 可以直接作为键
+    data = text.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class ReadmeStore:
+    """
+    按 blob oid 存储的 README 正文：
+    - zlib 压缩后写入 <oid[:2]>/<oid[2:]>.z
+    - 内容相同的 README 只存一份，跨仓库、跨运行去重
+    """
+
+    def __init__(self, root: Path = README_DIR):
+        self.root = Path(root)
+        self.stats = {"stored": 0, "deduplicated": 0}
+
+    def _path(self, oid: str) -> Path:
+        return self.root / oid[:2] / f"{oid[2:]}.z"
+
+    def __contains__(self, oid: str) -> bool:
+        return bool(oid) and self._path(oid).exists()
+
+    def put(self, text: str, *, oid: str | None = None) -> str:
+        """
+        return: README 的 blob oid
+        """
+        oid = oid or blob_oid(text)
+        path = self._path(oid)
+        if path.exists():
+            self.stats["deduplicated"] += 1
+            return oid
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(zlib.compress(text.encode("utf-8"), 6))
+        tmp_path.replace(path)
+        self.stats["stored"] += 1
+        return oid
+
+    def get(self, oid: str) -> str | None:
+        try:
+            return zlib.decompress(self._path(oid).read_bytes()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
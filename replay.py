@@ -0,0 +1,334 @@
+import asyncio
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+ARCHIVE_PATH = Path("cache") / "crawl_archive.jsonl.gz"
+# 录制时保留的响应头（缓存验证与限流相关）
+RECORDED_HEADERS = (
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    "Retry-After",
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+)
+
+
+def _graphql_fragment_key(query: str) -> str:
+    # 同一 profile 的查询共享同一个 fragment，与 batch 大小无关
+    fragment = query.split("fragment RepoFields", 1)[-1]
+    return hashlib.sha1(fragment.encode("utf-8")).hexdigest()[:16]
+
+
+class CrawlArchive:
+    """
+    gzip 压缩的 JSONL 抓取存档，每行是一次 GET 页面或一次 GraphQL 请求 / 响应
+    """
+
+    def __init__(self, path: Path = ARCHIVE_PATH):
+        self.path = Path(path)
+        self.pages = {}
+        self.graphql_pairs = {}
+        self.graphql_nodes = {}
+        self.rate_limit = None
+        self._file = None
+
+    @classmethod
+    def load(cls, path: Path = ARCHIVE_PATH) -> "CrawlArchive":
+        archive = cls(path)
+        with gzip.open(archive.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    archive._index(json.loads(line))
+        return archive
+
+    def _index(self, entry: dict):
+        if entry["kind"] == "get":
+            self.pages[entry["url"]] = entry
+            return
+
+        request = entry.get("request") or {}
+        body = entry.get("body") or {}
+        self.graphql_pairs[self._request_key(request)] = entry
+
+        # 按 (profile, repo) 建索引，回放时可以拼出任意 batch 组合的响应
+        data = body.get("data") or {}
+        fragment_key = _graphql_fragment_key(request.get("query", ""))
+        variables = request.get("variables") or {}
+        for alias, node in data.items():
+            if alias == "rateLimit":
+                self.rate_limit = node
+                continue
+            index = alias.removeprefix("repo_")
+            owner = variables.get(f"owner{index}")
+            name = variables.get(f"name{index}")
+            if node is not None and owner and name:
+                self.graphql_nodes[(fragment_key, owner.lower(), name.lower())] = node
+
+    @staticmethod
+    def _request_key(request: dict) -> str:
+        raw = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def open_for_record(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, "wt", encoding="utf-8")
+
+    def record(self, entry: dict):
+        self._index(entry)
+        if self._file is not None:
+            self._file.write(
+                json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+            )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def graphql_response(self, request: dict) -> dict:
+        entry = self.graphql_pairs.get(self._request_key(request))
+        if entry is not None:
+            return entry["body"]
+
+        fragment_key = _graphql_fragment_key(request.get("query", ""))
+        variables = request.get("variables") or {}
+        data = {}
+        errors = []
+        index = 0
+        while f"owner{index}" in variables:
+            node = self.graphql_nodes.get(
+                (
+                    fragment_key,
+                    variables[f"owner{index}"].lower(),
+                    variables[f"name{index}"].lower(),
+                )
+            )
+            data[f"repo_{index}"] = node
+            if node is None:
+                errors.append(
+                    {
+                        "type": "NOT_FOUND",
+                        "path": [f"repo_{index}"],
+                        "message": "not recorded in crawl archive",
+                    }
+                )
+            index += 1
+
+        data["rateLimit"] = self.rate_limit
+        body = {"data": data}
+        if errors:
+            body["errors"] = errors
+        return body
+
+
+class _RecordingContent:
+    def __init__(self, content: aiohttp.StreamReader, chunks: list[bytes]):
+        self._content = content
+        self._chunks = chunks
+
+    async def iter_chunked(self, n: int):
+        async for chunk in self._content.iter_chunked(n):
+            self._chunks.append(chunk)
+            yield chunk
+
+
+class _RecordingResponse:
+    def __init__(self, request_context, archive: CrawlArchive, url: str, request):
+        self._request_context = request_context
+        self._archive = archive
+        self._url = url
+        self._request = request
+        self._response = None
+        self._chunks = []
+        self._text = None
+        self._json = None
+
+    async def __aenter__(self):
+        self._response = await self._request_context.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._record()
+        finally:
+            await self._request_context.__aexit__(exc_type, exc, tb)
+
+    def _record(self):
+        response = self._response
+        headers = {
+            name: response.headers[name]
+            for name in RECORDED_HEADERS
+            if name in response.headers
+        }
+        if self._request is not None:
+            self._archive.record(
+                {
+                    "kind": "graphql",
+                    "url": self._url,
+                    "status": response.status,
+                    "headers": headers,
+                    "request": self._request,
+                    "body": self._json,
+                }
+            )
+            return
+
+        body = self._text
+        if body is None:
+            # 分块读取时正文未经 aiohttp 缓存，没有 charset 就无法推断编码
+            try:
+                encoding = response.get_encoding()
+            except RuntimeError:
+                encoding = "utf-8"
+            body = b"".join(self._chunks).decode(encoding, errors="replace")
+        self._archive.record(
+            {
+                "kind": "get",
+                "url": self._url,
+                "status": response.status,
+                "headers": headers,
+                "body": body,
+            }
+        )
+
+    @property
+    def status(self) -> int:
+        return self._response.status
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def content(self) -> _RecordingContent:
+        return _RecordingContent(self._response.content, self._chunks)
+
+    def get_encoding(self) -> str:
+        return self._response.get_encoding()
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+    async def text(self) -> str:
+        self._text = await self._response.text()
+        return self._text
+
+    async def json(self):
+        self._json = await self._response.json()
+        return self._json
+
+
+class RecordingSession:
+    """
+    包装真实的 aiohttp.ClientSession，把所有 GET 页面与 GraphQL 请求写入存档
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, archive: CrawlArchive):
+        self._session = session
+        self.archive = archive
+
+    async def __aenter__(self):
+        await self._session.__aenter__()
+        self.archive.open_for_record()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.archive.close()
+        await self._session.__aexit__(exc_type, exc, tb)
+
+    def get(self, url: str, **kwargs) -> _RecordingResponse:
+        return _RecordingResponse(
+            self._session.get(url, **kwargs), self.archive, url, None
+        )
+
+    def post(self, url: str, *, json=None, **kwargs) -> _RecordingResponse:
+        return _RecordingResponse(
+            self._session.post(url, json=json, **kwargs), self.archive, url, json
+        )
+
+
+class _ReplayContent:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def iter_chunked(self, n: int):
+        for start in range(0, len(self._body), n):
+            yield self._body[start : start + n]
+
+
+class _ReplayResponse:
+    def __init__(self, status: int, headers: dict, body, latency: float):
+        self.status = status
+        self.headers = headers
+        self._body = body
+        self._latency = latency
+
+    async def __aenter__(self):
+        if self._latency > 0:
+            await asyncio.sleep(self._latency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+    @property
+    def content(self) -> _ReplayContent:
+        return _ReplayContent(self._body.encode("utf-8"))
+
+    def get_encoding(self) -> str:
+        return "utf-8"
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientError(f"replayed HTTP status {self.status}")
+
+    async def text(self) -> str:
+        return self._body
+
+    async def json(self):
+        return self._body
+
+
+class ReplaySession:
+    """
+    从存档回放抓取，不访问网络；latency 为按 host 模拟的响应延迟（秒）
+    """
+
+    def __init__(
+        self, archive: CrawlArchive, latency: dict[str, float] | None = None
+    ):
+        self.archive = archive
+        self.latency = latency or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+    def _latency(self, url: str) -> float:
+        return self.latency.get(urlsplit(url).hostname or "", 0.0)
+
+    def get(self, url: str, **kwargs) -> _ReplayResponse:
+        entry = self.archive.pages.get(url)
+        if entry is None:
+            return _ReplayResponse(404, {}, "<html></html>", self._latency(url))
+        return _ReplayResponse(
+            entry["status"],
+            entry.get("headers") or {},
+            entry["body"],
+            self._latency(url),
+        )
+
+    def post(self, url: str, *, json=None, **kwargs) -> _ReplayResponse:
+        return _ReplayResponse(
+            200, {}, self.archive.graphql_response(json or {}), self._latency(url)
+        )
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from pathlib import Path
+
+
+CACHE_PATH = Path("cache") / "repos.json"
+DEFAULT_TTL = 6 * 3600
+# README 正文改存到 README 存储后，旧版本缓存中没有 blob oid，整体失效重新抓取
+CACHE_VERSION = 2
+
+# 列表页上的 stars / forks / added_stars 总是比缓存新，不从缓存回填
+CACHED_FIELDS = (
+    "repo_describe",
+    "repo_language",
+    "repo_issue",
+    "repo_pr",
+    "repo_commit",
+    "repo_topics",
+    "repo_readme_oid",
+    "repo_head_oid",
+)
+
+
+def repo_cache_key(repo_info: dict) -> str:
+    return f"{repo_info['repo_author']}/{repo_info['repo_name']}".lower()
+
+
+class RepoCache:
+    """
+    以 owner/name 为键的仓库详情缓存：
+    - refreshed_at 在 TTL 内的仓库直接复用，不再请求 GraphQL
+    - README 正文保存在 README 存储中，这里只记录 blob oid
+    - head_oid 未变化时复用 README，只刷新计数
+    - 保存前重新读取磁盘上的缓存并合并，多个 worker 共享缓存目录时不会覆盖彼此的记录
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, *, ttl: float = DEFAULT_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.entries = {}
+        self.stats = {"fresh": 0, "readme_reused": 0, "readme_fetched": 0, "miss": 0}
+        self._dirty = False
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            payload = {}
+        if payload.get("version") != CACHE_VERSION:
+            return {}
+        return payload.get("repos") or {}
+
+    def get(self, repo_info: dict) -> dict | None:
+        return self.entries.get(repo_cache_key(repo_info))
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - float(entry.get("refreshed_at") or 0) < self.ttl
+
+    def apply(self, repo_info: dict, entry: dict, *, readme_only: bool = False):
+        fields = ("repo_readme_oid",) if readme_only else CACHED_FIELDS
+        for field in fields:
+            if field in entry["data"]:
+                repo_info[field] = entry["data"][field]
+
+    def update(self, repo_info: dict):
+        self.entries[repo_cache_key(repo_info)] = {
+            "refreshed_at": time.time(),
+            "head_oid": repo_info.get("repo_head_oid"),
+            "data": {
+                field: repo_info[field] for field in CACHED_FIELDS if field in repo_info
+            },
+        }
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        # 其它进程在本进程加载之后写入的记录按 refreshed_at 保留较新的一份
+        for key, entry in self._load().items():
+            current = self.entries.get(key)
+            if current is None or float(entry.get("refreshed_at") or 0) > float(
+                current.get("refreshed_at") or 0
+            ):
+                self.entries[key] = entry
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 多个进程共享缓存目录时各自使用独立的临时文件，读者不会看到写了一半的文件
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {"version": CACHE_VERSION, "repos": self.entries},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+        self._dirty = False
@@ -0,0 +1,116 @@
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError(
+            "zstd compression requires the zstandard package: pip install zstandard"
+        ) from exc
+    return zstandard
+
+
+class ResultSink:
+    """
+    抓取结果的输出接口：write 逐条写出，close 完成输出，abort 在抓取失败时收尾
+    """
+
+    def write(self, record: dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonlSink(ResultSink):
+    """
+    每个 repo 一行 JSON，边抓取边追加到同目录的临时文件：
+    - close 时原子重命名为目标文件，并发运行不会写出半个文件
+    - 抓取中途失败时已写出的部分保留为 <path>.partial
+    """
+
+    def __init__(self, path: str | Path, *, compression: str | None = None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"unsupported compression: {compression}")
+        self.path = Path(path)
+        self.compression = compression
+        self.count = 0
+        self._tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self._file = None
+        self._closed = False
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compression == "gzip":
+            self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+        elif self.compression == "zstd":
+            writer = _zstandard().ZstdCompressor().stream_writer(
+                open(self._tmp_path, "wb")
+            )
+            self._file = io.TextIOWrapper(writer, encoding="utf-8")
+        else:
+            self._file = open(self._tmp_path, "w", encoding="utf-8")
+
+    def write(self, record: dict):
+        if self._file is None:
+            self._open()
+        self._file.write(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        )
+        self.count += 1
+
+    def _finish(self, target: Path):
+        if self._closed:
+            return
+        if self._file is None:
+            # 没有结果时也写出空文件，避免下游读到上一次的结果
+            self._open()
+        self._file.close()
+        self._file = None
+        self._closed = True
+        self._tmp_path.replace(target)
+
+    def close(self):
+        self._finish(self.path)
+
+    def abort(self):
+        self._finish(self.path.with_name(self.path.name + ".partial"))
+
+
+def read_jsonl(path: str | Path):
+    """
+    按后缀识别压缩格式，逐行读取 JsonlSink 写出的文件
+    """
+    path = Path(path)
+    if path.suffix == ".gz":
+        f = gzip.open(path, "rt", encoding="utf-8")
+    elif path.suffix == ".zst":
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"))
+        f = io.TextIOWrapper(reader, encoding="utf-8")
+    else:
+        f = open(path, "r", encoding="utf-8")
+
+    with f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
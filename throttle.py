@@ -0,0 +1,445 @@
+import asyncio
+import math
+import random
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+
+def _parse_reset_at(raw: str | None) -> float | None:
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class GraphQLBatchController:
+    """
+    根据 GraphQL rateLimit 与批次耗时动态调整 batch size 和并发数：
+    - 批次耗时超过 target_latency 或失败时按比例缩小 batch
+    - 耗时充裕时逐步放大 batch
+    - 剩余点数不足 10% 时，按剩余点数 / 距离重置的时间估算可承受的消耗速率，收紧并发
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        concurrency: int,
+        max_batch_size: int = 50,
+        max_concurrency: int = 8,
+        target_latency: float = 3.0,
+        tokens: "TokenPool | None" = None,
+    ):
+        self.tokens = tokens
+        self.initial_batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.batch_sizes = {}
+        self.latencies = {}
+        self.rate_limit = {}
+        self.batches = 0
+        self.failures = 0
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        # 持有唤醒任务的引用，避免任务完成前被回收
+        self._notify_tasks = set()
+
+    def batch_size(self, profile: str) -> int:
+        if profile not in self.batch_sizes:
+            # 不含 README 的批次响应很小，可以从更大的 batch 起步
+            initial = self.initial_batch_size
+            if profile == "counts":
+                initial = min(initial * 2, self.max_batch_size)
+            self.batch_sizes[profile] = initial
+        return self.batch_sizes[profile]
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def record(
+        self,
+        profile: str,
+        *,
+        size: int,
+        latency: float,
+        rate_limit: dict | None = None,
+    ):
+        self.batches += 1
+        previous = self.latencies.get(profile)
+        smoothed = latency if previous is None else 0.7 * previous + 0.3 * latency
+        self.latencies[profile] = smoothed
+
+        current = self.batch_size(profile)
+        if size >= current:
+            if smoothed > self.target_latency:
+                self.batch_sizes[profile] = max(1, int(current * 0.6))
+            elif smoothed < self.target_latency * 0.5:
+                self.batch_sizes[profile] = min(
+                    self.max_batch_size, current + max(1, math.ceil(current * 0.25))
+                )
+
+        if rate_limit:
+            self.rate_limit = {
+                "limit": int(rate_limit.get("limit") or 0),
+                "cost": int(rate_limit.get("cost") or 0),
+                "remaining": int(rate_limit.get("remaining") or 0),
+                "reset_at": rate_limit.get("resetAt"),
+            }
+        self._adjust_concurrency(smoothed)
+
+    def record_failure(self, profile: str):
+        self.failures += 1
+        current = self.batch_size(profile)
+        self.batch_sizes[profile] = max(1, current // 2)
+        self._set_concurrency(self.concurrency - 1)
+
+    def _adjust_concurrency(self, latency: float):
+        cost = self.rate_limit.get("cost") or 1
+        limit = self.rate_limit.get("limit") or 0
+        remaining = self.rate_limit.get("remaining")
+        reset_at = _parse_reset_at(self.rate_limit.get("reset_at"))
+
+        if remaining is not None:
+            if remaining < cost * self.concurrency * 2:
+                self._set_concurrency(1)
+                return
+            if reset_at is not None and limit and remaining < limit * 0.1:
+                seconds_to_reset = max(reset_at - time.time(), 1.0)
+                budget_rate = remaining / seconds_to_reset
+                spend_rate = cost * self.concurrency / max(latency, 0.05)
+                if spend_rate > budget_rate:
+                    self._set_concurrency(self.concurrency - 1)
+                    return
+
+        if latency < self.target_latency:
+            self._set_concurrency(self.concurrency + 1)
+        elif latency > self.target_latency * 2:
+            self._set_concurrency(self.concurrency - 1)
+
+    def _set_concurrency(self, value: int):
+        previous = self.concurrency
+        self.concurrency = min(max(1, value), self.max_concurrency)
+        if self.concurrency > previous:
+            # 并发上调后唤醒等待中的批次
+            task = asyncio.get_running_loop().create_task(self._notify())
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_tasks.discard)
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def summary(self) -> dict:
+        return {
+            "batch_sizes": dict(self.batch_sizes),
+            "concurrency": self.concurrency,
+            "batches": self.batches,
+            "failures": self.failures,
+            "latency": {
+                profile: round(latency, 3)
+                for profile, latency in self.latencies.items()
+            },
+            "rate_limit": dict(self.rate_limit),
+            "tokens": self.tokens.summary() if self.tokens is not None else {},
+        }
+
+
+class AIMDConcurrencyLimiter:
+    """
+    AIMD 自适应并发上限，可以像 asyncio.Semaphore 一样 async with 使用：
+    - 首次遇到拥塞前按慢启动处理，并发打满时每完成一个请求上限 +1，尽快找到容量
+    - 之后并发打满且延迟正常时，每完成约 limit 个请求上限 +1（加性增）
+    - 429 / 5xx / 超时，或平滑延迟超过基线的 latency_tolerance 倍时上限乘以 backoff（乘性减）
+    - 一个往返时间内最多下调一次，避免同一批失败的请求把上限一路压到最低
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.peak = int(self.limit)
+        self.latency = None
+        self.baseline = None
+        self.requests = 0
+        self.failures = 0
+        self.increases = 0
+        self.decreases = 0
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._condition = asyncio.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        return int(self.limit)
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def record(self, latency: float):
+        """
+        latency: 从发出请求到收到响应头的耗时（不含排队与本地限速等待）
+        """
+        self.requests += 1
+        self.latency = (
+            latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        )
+        # 基线跟随最低延迟，并缓慢上浮以适应网络整体变慢
+        self.baseline = (
+            latency
+            if self.baseline is None
+            else min(latency, 0.99 * self.baseline + 0.01 * latency)
+        )
+
+        if self.latency > max(
+            self.baseline * self.latency_tolerance, self.baseline + 0.05
+        ):
+            self._decrease()
+        elif self._in_flight >= self.concurrency:
+            # 只有并发被打满时才上调，空闲时上限不会无意义地增长
+            previous = self.concurrency
+            step = 1 if self._slow_start else 1 / self.limit
+            self.limit = min(self.max_limit, self.limit + step)
+            if self.concurrency > previous:
+                self.increases += 1
+                self.peak = max(self.peak, self.concurrency)
+
+    def record_failure(self):
+        self.failures += 1
+        self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < max(self.latency or 0.0, 0.05):
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        previous = self.concurrency
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        if self.concurrency < previous:
+            self.decreases += 1
+
+    def summary(self) -> dict:
+        return {
+            "limit": self.concurrency,
+            "peak": self.peak,
+            "requests": self.requests,
+            "failures": self.failures,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "baseline": round(self.baseline, 3) if self.baseline is not None else None,
+        }
+
+
+class TokensExhaustedError(RuntimeError):
+    pass
+
+
+class TokenPool:
+    """
+    多个 GitHub token 轮换使用：
+    - 每次请求选择剩余点数（扣除在途请求）最多的 token
+    - 剩余点数耗尽或被限流的 token 停用到 resetAt 之后
+    """
+
+    def __init__(
+        self,
+        tokens: list[str],
+        *,
+        default_limit: int = 5000,
+        max_wait: float = 60.0,
+    ):
+        self.default_limit = default_limit
+        self.max_wait = max_wait
+        self.last_cost = 1
+        self._states = {
+            token: {
+                "limit": None,
+                "remaining": None,
+                "reset_at": None,
+                "parked_until": 0.0,
+                "in_flight": 0,
+                "requests": 0,
+            }
+            for token in dict.fromkeys(tokens)
+            if token
+        }
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _headroom(self, state: dict) -> float:
+        remaining = state["remaining"]
+        if remaining is None:
+            remaining = state["limit"] or self.default_limit
+        return remaining - state["in_flight"] * self.last_cost
+
+    async def acquire(self) -> str:
+        while True:
+            now = time.time()
+            available = [
+                (token, state)
+                for token, state in self._states.items()
+                if state["parked_until"] <= now
+            ]
+            if available:
+                token, state = max(available, key=lambda item: self._headroom(item[1]))
+                state["in_flight"] += 1
+                state["requests"] += 1
+                return token
+
+            wait = min(state["parked_until"] for state in self._states.values()) - now
+            if wait > self.max_wait:
+                raise TokensExhaustedError(
+                    f"all GitHub tokens are rate limited for {wait:.0f}s"
+                )
+            await asyncio.sleep(max(wait, 0.05))
+
+    def release(self, token: str, rate_limit: dict | None = None):
+        state = self._states[token]
+        state["in_flight"] -= 1
+        if not rate_limit:
+            return
+
+        self.last_cost = max(int(rate_limit.get("cost") or 1), 1)
+        state["limit"] = int(rate_limit.get("limit") or 0) or state["limit"]
+        state["remaining"] = int(rate_limit.get("remaining") or 0)
+        state["reset_at"] = _parse_reset_at(rate_limit.get("resetAt"))
+        if state["remaining"] < self.last_cost:
+            self.park(token)
+
+    def park(self, token: str, until: float | None = None):
+        state = self._states[token]
+        if until is None:
+            until = state["reset_at"] or time.time() + self.max_wait
+        state["parked_until"] = until
+        # 重置后点数恢复，未知剩余点数按满额处理
+        state["remaining"] = None
+
+    def combined_rate_limit(self) -> dict | None:
+        known = [
+            state for state in self._states.values() if state["remaining"] is not None
+        ]
+        if not known:
+            return None
+
+        reset_times = [state["reset_at"] for state in known if state["reset_at"]]
+        return {
+            "limit": sum(state["limit"] or self.default_limit for state in known),
+            "cost": self.last_cost,
+            "remaining": sum(state["remaining"] for state in known),
+            "resetAt": (
+                datetime.fromtimestamp(min(reset_times)).astimezone().isoformat()
+                if reset_times
+                else None
+            ),
+        }
+
+    def summary(self) -> dict:
+        now = time.time()
+        return {
+            f"...{token[-4:]}": {
+                "requests": state["requests"],
+                "remaining": state["remaining"],
+                "parked": state["parked_until"] > now,
+            }
+            for token, state in self._states.items()
+        }
+
+
+class TokenBucket:
+    """
+    令牌桶限速：rate 为每秒补充的令牌数，burst 为桶容量。
+    令牌不足时预约未来的令牌（允许为负），不依赖事件循环绑定的锁
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= 1
+
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class HostRateLimiter:
+    """
+    按 host 共享的限速器，github.com 与 api.github.com 各自使用独立的令牌桶
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, int]],
+        default: tuple[float, int] = (10.0, 10),
+    ):
+        self.limits = dict(limits)
+        self.default = default
+        self._buckets = {}
+        self.enabled = True
+        self.waited = 0.0
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).hostname or ""
+        if host not in self._buckets:
+            rate, burst = self.limits.get(host, self.default)
+            self._buckets[host] = TokenBucket(rate, burst)
+        return self._buckets[host]
+
+    async def acquire(self, url: str):
+        if not self.enabled:
+            return
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            self.waited += wait
+            await asyncio.sleep(wait)
+
+    def pause(self, url: str, seconds: float):
+        self.bucket(url).pause(seconds)
+
+
+def backoff_delay(attempt: int, *, base: float, cap: float) -> float:
+    # 指数退避 + full jitter，避免多个请求同时重试
+    return random.uniform(0, min(cap, base * 2**attempt))
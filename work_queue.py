@@ -0,0 +1,536 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import crawler
+from http_cache import ResponseCache
+from pipeline import build_topic_heats_from_repos
+from readme_store import ReadmeStore
+from repo_cache import RepoCache
+
+
+QUEUE_PATH = Path("cache") / "work_queue.sqlite3"
+LEASE_TIMEOUT = 120.0
+MAX_ATTEMPTS = 3
+ENRICH_BATCH_SIZE = 20
+WORKER_CONCURRENCY = 4
+POLL_INTERVAL = 1.0
+
+_QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    languages TEXT NOT NULL,
+    time_ranges TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'running',
+    lease_owner TEXT,
+    lease_expires REAL
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_repos (
+    job_id TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    PRIMARY KEY (job_id, repo)
+);
+CREATE INDEX IF NOT EXISTS idx_units_state ON units (state, job_id);
+CREATE INDEX IF NOT EXISTS idx_units_job ON units (job_id, kind, state);
+"""
+
+
+def _log(message: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+def _repo_path(repo_info: dict) -> tuple[str, str]:
+    return repo_info["repo_author"], repo_info["repo_name"]
+
+
+class MergeLeaseLostError(RuntimeError):
+    # 合并租约过期并被其它 worker 重新认领
+    pass
+
+
+class LeaseQueue:
+    """
+    SQLite 租约队列，多个进程 / 机器通过共享文件系统上的同一个数据库协作：
+    - 每个单元是一个列表页或一批待补齐详情的 repo，领取时加租约
+    - worker 崩溃后租约过期，单元由其它 worker 重新领取，只损失该单元已做的工作
+    - 列表页完成时在同一事务中登记新 repo 并生成详情批次，同一 repo 只抓取一次
+    不开启 WAL：WAL 依赖共享内存，不能跨机器使用
+    """
+
+    def __init__(
+        self,
+        path: str | Path = QUEUE_PATH,
+        *,
+        lease_timeout: float = LEASE_TIMEOUT,
+        max_attempts: int = MAX_ATTEMPTS,
+        batch_size: int = ENRICH_BATCH_SIZE,
+    ):
+        self.path = Path(path)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_QUEUE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE 先拿写锁，避免两个 worker 同时领取同一个单元
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def create_job(
+        self, *, languages: list[str] | None, time_ranges: list[str] | tuple[str, ...]
+    ) -> str:
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        time_ranges = list(dict.fromkeys(time_ranges))
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, created_at, languages, time_ranges) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    job_id,
+                    datetime.now(timezone.utc).isoformat(),
+                    json.dumps(languages, ensure_ascii=False),
+                    json.dumps(time_ranges),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO units (job_id, kind, payload) VALUES (?, 'list', ?)",
+                [
+                    (job_id, json.dumps({"time_range": time_range, "url": url}))
+                    for time_range in time_ranges
+                    for url in crawler._trending_urls(languages, time_range)
+                ],
+            )
+        return job_id
+
+    def lease(self, owner: str) -> dict | None:
+        """
+        优先领取列表页（它们会产生新的详情批次），其次是详情批次
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    """SELECT units.id, units.job_id, units.kind, units.payload,
+                        units.attempts
+                    FROM units JOIN jobs ON jobs.id = units.job_id
+                    WHERE jobs.state = 'running' AND (
+                        units.state = 'pending'
+                        OR (units.state = 'leased' AND units.lease_expires < ?)
+                    )
+                    ORDER BY units.kind = 'list' DESC, units.id
+                    LIMIT 1""",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= self.max_attempts:
+                    # 多次领取后租约都过期（worker 反复崩溃），不再重试
+                    conn.execute(
+                        "UPDATE units SET state = 'failed', error = ? WHERE id = ?",
+                        ("lease expired too many times", row["id"]),
+                    )
+                    continue
+
+                conn.execute(
+                    "UPDATE units SET state = 'leased', lease_owner = ?, "
+                    "lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                    (owner, now + self.lease_timeout, row["id"]),
+                )
+                return {
+                    "id": row["id"],
+                    "job_id": row["job_id"],
+                    "kind": row["kind"],
+                    "payload": json.loads(row["payload"]),
+                }
+
+    def renew(self, unit: dict, owner: str) -> bool:
+        """
+        处理时间较长的单元定期续租；return: False 表示租约已被其它 worker 接手
+        """
+        with self._transaction() as conn:
+            return bool(
+                conn.execute(
+                    "UPDATE units SET lease_expires = ? WHERE id = ? "
+                    "AND state = 'leased' AND lease_owner = ?",
+                    (time.time() + self.lease_timeout, unit["id"], owner),
+                ).rowcount
+            )
+
+    def complete(
+        self,
+        unit: dict,
+        owner: str,
+        result: list[dict],
+        enrich_repos: list[dict] | None = None,
+    ) -> bool:
+        """
+        enrich_repos: 列表页解析出的 repo，其中本 job 首次出现的按批次生成详情单元
+        return: False 表示租约已过期并被其它 worker 接手，本次结果被丢弃
+        """
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE units SET state = 'done', result = ?, lease_owner = NULL, "
+                "lease_expires = NULL WHERE id = ? AND state = 'leased' "
+                "AND lease_owner = ?",
+                (
+                    json.dumps(result, ensure_ascii=False, separators=(",", ":")),
+                    unit["id"],
+                    owner,
+                ),
+            ).rowcount
+            if not updated:
+                return False
+
+            new_repos = []
+            for repo_info in enrich_repos or []:
+                author, name = _repo_path(repo_info)
+                if conn.execute(
+                    "INSERT OR IGNORE INTO job_repos (job_id, repo) VALUES (?, ?)",
+                    (unit["job_id"], f"{author}/{name}".lower()),
+                ).rowcount:
+                    new_repos.append(repo_info)
+            conn.executemany(
+                "INSERT INTO units (job_id, kind, payload) VALUES (?, 'enrich', ?)",
+                [
+                    (
+                        unit["job_id"],
+                        json.dumps(
+                            {"repos": new_repos[start : start + self.batch_size]},
+                            ensure_ascii=False,
+                        ),
+                    )
+                    for start in range(0, len(new_repos), self.batch_size)
+                ],
+            )
+        return True
+
+    def fail(self, unit: dict, owner: str, error: str):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' "
+                "ELSE 'pending' END, error = ?, lease_owner = NULL, "
+                "lease_expires = NULL WHERE id = ? AND state = 'leased' "
+                "AND lease_owner = ?",
+                (self.max_attempts, error, unit["id"], owner),
+            )
+
+    def claim_merge(self, owner: str) -> str | None:
+        """
+        所有单元都已结束的 job 由一个 worker 负责合并；合并中途崩溃时租约过期后可重新认领
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                """SELECT id FROM jobs
+                WHERE (
+                    state = 'running'
+                    OR (state = 'merging' AND lease_expires < ?)
+                ) AND NOT EXISTS (
+                    SELECT 1 FROM units
+                    WHERE units.job_id = jobs.id
+                    AND units.state IN ('pending', 'leased')
+                )
+                ORDER BY created_at
+                LIMIT 1""",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'merging', lease_owner = ?, "
+                "lease_expires = ? WHERE id = ?",
+                (owner, now + self.lease_timeout, row["id"]),
+            )
+            return row["id"]
+
+    def renew_merge(self, job_id: str, owner: str) -> bool:
+        """
+        合并期间定期续租；return: False 表示合并已被其它 worker 重新认领
+        """
+        with self._transaction() as conn:
+            return bool(
+                conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE id = ? "
+                    "AND state = 'merging' AND lease_owner = ?",
+                    (time.time() + self.lease_timeout, job_id, owner),
+                ).rowcount
+            )
+
+    def finish_merge(self, job_id: str, owner: str) -> bool:
+        with self._transaction() as conn:
+            return bool(
+                conn.execute(
+                    "UPDATE jobs SET state = 'done', lease_owner = NULL, "
+                    "lease_expires = NULL WHERE id = ? AND state = 'merging' "
+                    "AND lease_owner = ?",
+                    (job_id, owner),
+                ).rowcount
+            )
+
+    def has_active_jobs(self) -> bool:
+        with closing(self._connect()) as conn:
+            return (
+                conn.execute(
+                    "SELECT 1 FROM jobs WHERE state IN ('running', 'merging') LIMIT 1"
+                ).fetchone()
+                is not None
+            )
+
+    def load_job(self, job_id: str) -> dict:
+        """
+        return: {"languages", "time_ranges", "units", "repos"}，
+        repos 为 {time_range: [repo_info, ...]}，按列表页顺序去重并补上详情
+        """
+        with closing(self._connect()) as conn:
+            job = conn.execute(
+                "SELECT languages, time_ranges FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            units = {
+                f"{row['kind']}_{row['state']}": row["count"]
+                for row in conn.execute(
+                    "SELECT kind, state, COUNT(*) AS count FROM units "
+                    "WHERE job_id = ? GROUP BY kind, state",
+                    (job_id,),
+                )
+            }
+
+            enriched_repo_infos = {}
+            for row in conn.execute(
+                "SELECT result FROM units WHERE job_id = ? AND kind = 'enrich' "
+                "AND state = 'done'",
+                (job_id,),
+            ):
+                for repo_info in json.loads(row["result"]):
+                    enriched_repo_infos[_repo_path(repo_info)] = repo_info
+
+            time_ranges = json.loads(job["time_ranges"])
+            range_repo_infos = {time_range: {} for time_range in time_ranges}
+            for row in conn.execute(
+                "SELECT payload, result FROM units WHERE job_id = ? AND kind = 'list' "
+                "AND state = 'done' ORDER BY id",
+                (job_id,),
+            ):
+                seen_repos = range_repo_infos[json.loads(row["payload"])["time_range"]]
+                for repo_info in json.loads(row["result"]):
+                    repo_path = _repo_path(repo_info)
+                    if repo_path in seen_repos:
+                        continue
+                    if repo_path in enriched_repo_infos:
+                        crawler._sync_enriched_fields(
+                            repo_info, enriched_repo_infos[repo_path]
+                        )
+                    seen_repos[repo_path] = repo_info
+
+        return {
+            "languages": json.loads(job["languages"]),
+            "time_ranges": time_ranges,
+            "units": units,
+            "repos": {
+                time_range: list(seen_repos.values())
+                for time_range, seen_repos in range_repo_infos.items()
+            },
+        }
+
+
+class QueueWorker:
+    """
+    从租约队列领取单元执行抓取，同一进程内同时处理 concurrency 个单元并共享一个 session；
+    job 的所有单元结束后，由最先发现的 worker 合并结果并写入 history_store 快照
+    """
+
+    def __init__(
+        self,
+        queue: LeaseQueue,
+        *,
+        worker_id: str | None = None,
+        concurrency: int = WORKER_CONCURRENCY,
+        poll_interval: float = POLL_INTERVAL,
+        exit_when_idle: bool = True,
+    ):
+        self.queue = queue
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        )
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.exit_when_idle = exit_when_idle
+        self.stats = {"list": 0, "enrich": 0, "failed": 0, "lost": 0, "merged": 0}
+
+        self._list_semaphore = asyncio.Semaphore(crawler.LIST_PAGE_CONCURRENCY)
+        self._detail_limiter = crawler._new_detail_limiter()
+        self._controller = (
+            crawler._new_graphql_controller() if crawler.GITHUB_TOKENS else None
+        )
+        self._cache = (
+            ResponseCache(
+                ttl=crawler.HTTP_CACHE_TTL, max_bytes=crawler.HTTP_CACHE_MAX_BYTES
+            )
+            if crawler.HTTP_CACHE_ENABLED
+            else None
+        )
+        self._repo_cache = (
+            RepoCache(ttl=crawler.REPO_CACHE_TTL)
+            if crawler.REPO_CACHE_ENABLED
+            else None
+        )
+        self._readme_store = ReadmeStore()
+
+    async def _process(self, session, unit: dict) -> tuple[list[dict], list | None]:
+        payload = unit["payload"]
+        if unit["kind"] == "list":
+            page_repo_infos = await crawler.get_repo_url(
+                session, payload["url"], self._list_semaphore, self._cache
+            )
+            repo_infos = list(page_repo_infos.values())
+            return repo_infos, repo_infos
+
+        repo_infos = await crawler.enrich_repo_infos(
+            session,
+            payload["repos"],
+            detail_limiter=self._detail_limiter,
+            controller=self._controller,
+            cache=self._cache,
+            repo_cache=self._repo_cache,
+            readme_store=self._readme_store,
+        )
+        return repo_infos, None
+
+    async def _keep_lease(self, renew, *args):
+        while True:
+            await asyncio.sleep(self.queue.lease_timeout / 3)
+            if not await asyncio.to_thread(renew, *args, self.worker_id):
+                return
+
+    def _check_merge_lease(self, job_id: str):
+        # 写入快照前确认合并租约仍属于本 worker，并续租覆盖写入所需的时间
+        if not self.queue.renew_merge(job_id, self.worker_id):
+            raise MergeLeaseLostError(job_id)
+
+    def _merge(self, job_id: str):
+        job = self.queue.load_job(job_id)
+        topic_heats = build_topic_heats_from_repos(
+            job["repos"],
+            languages=job["languages"],
+            before_save=lambda: self._check_merge_lease(job_id),
+        )
+        if not self.queue.finish_merge(job_id, self.worker_id):
+            raise MergeLeaseLostError(job_id)
+        self.stats["merged"] += 1
+        _log(
+            f"job {job_id} merged ({job['units']}): "
+            + ", ".join(
+                f"{time_range} {len(job['repos'][time_range])} repos "
+                f"{len(topic_heat)} topics"
+                for time_range, topic_heat in topic_heats.items()
+            )
+        )
+
+    async def _loop(self, session):
+        while True:
+            unit = await asyncio.to_thread(self.queue.lease, self.worker_id)
+            if unit is None:
+                job_id = await asyncio.to_thread(self.queue.claim_merge, self.worker_id)
+                if job_id is not None:
+                    keep_lease = asyncio.create_task(
+                        self._keep_lease(self.queue.renew_merge, job_id)
+                    )
+                    try:
+                        await asyncio.to_thread(self._merge, job_id)
+                    except MergeLeaseLostError:
+                        self.stats["lost"] += 1
+                        _log(f"job {job_id} merge lease lost")
+                    except Exception as exc:
+                        _log(f"job {job_id} merge failed: {exc!r}")
+                    finally:
+                        keep_lease.cancel()
+                    continue
+                if self.exit_when_idle and not await asyncio.to_thread(
+                    self.queue.has_active_jobs
+                ):
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            keep_lease = asyncio.create_task(self._keep_lease(self.queue.renew, unit))
+            try:
+                result, enrich_repos = await self._process(session, unit)
+            except Exception as exc:
+                # 解析异常等也要交还租约，否则会拖垮整个 worker
+                self.stats["failed"] += 1
+                _log(f"{unit['kind']} unit {unit['id']} failed: {exc!r}")
+                await asyncio.to_thread(
+                    self.queue.fail, unit, self.worker_id, repr(exc)
+                )
+                continue
+            finally:
+                keep_lease.cancel()
+
+            completed = await asyncio.to_thread(
+                self.queue.complete, unit, self.worker_id, result, enrich_repos
+            )
+            self.stats[unit["kind"] if completed else "lost"] += 1
+
+    async def run(self):
+        async with crawler.create_session() as session:
+            await asyncio.gather(
+                *(self._loop(session) for _ in range(self.concurrency))
+            )
+        if self._cache is not None:
+            self._cache.prune()
+        _log(f"worker {self.worker_id} stopped: {self.stats}")
+
+
+def enqueue_crawl(
+    *,
+    languages: list[str] | None,
+    time_ranges: list[str] | tuple[str, ...],
+    path: str | Path = QUEUE_PATH,
+) -> str:
+    return LeaseQueue(path).create_job(languages=languages, time_ranges=time_ranges)
+
+
+def run_worker(
+    *,
+    path: str | Path = QUEUE_PATH,
+    concurrency: int = WORKER_CONCURRENCY,
+    exit_when_idle: bool = True,
+) -> dict:
+    worker = QueueWorker(
+        LeaseQueue(path), concurrency=concurrency, exit_when_idle=exit_when_idle
+    )
+    asyncio.run(worker.run())
+    return worker.stats